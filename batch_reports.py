@@ -0,0 +1,113 @@
+# batch_reports.py
+import csv
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from drl_config import DRLConfiguration
+
+# Batch modes and the partition dimensions they use
+PARTITIONS = {
+    'device': ['Device'],
+    'month': ['Month'],
+    'device_month': ['Device', 'Month']
+}
+INDEX_FILE = "index.csv"
+
+
+def partition_columns(chunk, partition_by):
+    columns = []
+    for dimension in PARTITIONS[partition_by]:
+        if dimension == 'Device':
+            columns.append(chunk['DeviceObserverModelName'].astype(object)
+                           .replace('', 'Unknown device').rename('Device'))
+        else:
+            columns.append(chunk['StudyDate'].dt.strftime('%Y-%m')
+                           .fillna('Unknown month').rename('Month'))
+    return columns
+
+
+def safe_file_name(name):
+    return re.sub(r'[^\w.-]+', '_', name).strip('_') or 'report'
+
+
+def unique_name(name, used_names):
+    """name, or name_2, name_3... if a partition already uses it (e.g. 'CT/1' and 'CT 1')"""
+    candidate = name
+    number = 1
+    # Compared case-insensitively, as on Windows file systems
+    while candidate.lower() in used_names:
+        number += 1
+        candidate = f"{name}_{number}"
+    used_names.add(candidate.lower())
+    return candidate
+
+
+def render_partition(task):
+    """Write the Excel and PDF report of one partition (runs in a worker process)"""
+    import dose_summary
+    import pdf_report
+    from spill_store import read_chunks, write_excel
+
+    write_excel(read_chunks(task['spill_path']), task['excel_path'])
+    summary = dose_summary.combine(
+        dose_summary.summarize(chunk) for chunk in read_chunks(task['spill_path']))
+    pdf_report.generate_pdf_report(summary, task['pdf_path'], DRLConfiguration(),
+                                   task['date_range'], task['device'])
+    return {
+        'Device': task['device'],
+        'Month': task['month'],
+        'Records': int(summary['count'].sum()),
+        'Excel': task['excel_path'],
+        'PDF': task['pdf_path']
+    }
+
+
+def generate_batch_reports(chunks, output_dir, partition_by='device_month', date_range='',
+                           max_workers=None):
+    """One Excel and PDF report per device and/or StudyDate month.
+
+    The records (DataFrame chunks, e.g. SpillStore.iter_chunks()) are split into
+    one spill file per partition, and the partitions are rendered in a process
+    pool because PDF rendering is CPU bound. An index of all reports is written
+    to output_dir/index.csv. Returns the index rows.
+    """
+    from spill_store import append_chunk
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix='dicom_sr_batch_') as work_dir:
+        partitions = {}
+        for chunk in chunks:
+            for key, part in chunk.groupby(partition_columns(chunk, partition_by), sort=False):
+                if key not in partitions:
+                    partitions[key] = os.path.join(work_dir, f"partition_{len(partitions)}.pkl")
+                append_chunk(partitions[key], part)
+
+        tasks = []
+        used_names = set()
+        for key, spill_path in sorted(partitions.items()):
+            values = dict(zip(PARTITIONS[partition_by], key))
+            name = unique_name(safe_file_name('_'.join(['DICOM_SR'] + list(key))), used_names)
+            tasks.append({
+                'spill_path': spill_path,
+                'excel_path': os.path.join(output_dir, name + ".xlsx"),
+                'pdf_path': os.path.join(output_dir, name + ".pdf"),
+                'device': values.get('Device', ''),
+                'month': values.get('Month', ''),
+                'date_range': values.get('Month', date_range)
+            })
+
+        # spawn as in IsolatedReader: forking the Tk process while the preload
+        # thread is importing modules can leave the workers with broken imports
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            index = list(pool.map(render_partition, tasks))
+
+    with open(os.path.join(output_dir, INDEX_FILE), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['Device', 'Month', 'Records', 'Excel', 'PDF'])
+        writer.writeheader()
+        writer.writerows(index)
+    return index
@@ -0,0 +1,64 @@
+# benchmarks/import_time.py
+"""Startup benchmark: import time of the entry modules, measured with -X importtime.
+
+Fails (exit code 1) if an entry module imports one of the heavy libraries at
+startup or takes longer than the budget. Run from the repository root:
+
+    python benchmarks/import_time.py [--budget-ms 300] [--repeat 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_MODULES = ['main', 'cli', 'drl_config', 'drl_config_window']
+# Libraries that must only be imported when the stage using them runs
+HEAVY_MODULES = ['pandas', 'numpy', 'pydicom', 'openpyxl', 'jinja2', 'xhtml2pdf', 'reportlab']
+
+
+def measure(module):
+    """(cumulative import time in microseconds, set of imported modules)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    total = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imported.add(name.strip())
+        if name.strip() == module:
+            total = int(cumulative)
+    return total, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=300,
+                        help="maximum import time of every entry module")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="runs per module; the fastest one is reported")
+    args = parser.parse_args()
+
+    failures = []
+    for module in ENTRY_MODULES:
+        runs = [measure(module) for _ in range(args.repeat)]
+        best = min(total for total, _ in runs) / 1000
+        heavy = sorted(name for name in HEAVY_MODULES if name in runs[0][1])
+        print(f"{module:20} {best:8.1f} ms  {'heavy: ' + ', '.join(heavy) if heavy else ''}")
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)} at startup")
+        if best > args.budget_ms:
+            failures.append(f"{module} takes {best:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+# cli.py
+import argparse
+import multiprocessing
+import os
+import sys
+import warnings
+from datetime import datetime
+
+from batch_reports import PARTITIONS
+from drl_config import DRLConfiguration
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%d.%m.%Y').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected dd.mm.yyyy")
+
+
+def extract_records(args, drl_config):
+    """Scan args.path and return a SpillStore with the extracted records"""
+    import dicom_sources
+    import dose_records
+    from dose_cube import DoseCube
+    from failure_cache import FailureCache
+    from patient_index import PatientIndex
+    from spill_store import SpillStore
+
+    failures = FailureCache()
+    dicom_files = dicom_sources.find_dicom_files(
+        args.path, not args.no_subdirs,
+        parse_date(args.date_from) if args.date_from else None,
+        parse_date(args.date_to) if args.date_to else None,
+        failures=failures, timeout=args.timeout)
+    if not dicom_files:
+        failures.save()
+        sys.exit("No DICOM files found")
+
+    results = SpillStore(args.chunk_size) if args.chunk_size else SpillStore()
+    dose_records.extract_records(dicom_sources.iter_source_files(dicom_files), results,
+                                 failures, args.timeout)
+    failures.save()
+    if failures.new or failures.skipped:
+        print(f"{failures.new} unreadable files, {failures.skipped} known bad files skipped")
+
+    if not len(results):
+        results.close()
+        sys.exit("No valid DICOM SR files found")
+
+    # The reports are still written if the indexes cannot be updated
+    try:
+        dose_cube = DoseCube()
+        patient_index = PatientIndex()
+        for load_error in (dose_cube.load_error, patient_index.load_error):
+            if load_error:
+                print(load_error, file=sys.stderr)
+        for chunk in results.iter_chunks():
+            dose_cube.add(chunk, drl_config)
+            patient_index.add(chunk)
+        dose_cube.save()
+        patient_index.save()
+    except Exception as e:
+        print(f"Failed to update the dose cube and patient index: {e}", file=sys.stderr)
+    return results
+
+
+def report(args):
+    import dose_summary
+    import pdf_report
+    from spill_store import write_excel
+
+    drl_config = DRLConfiguration()
+    with extract_records(args, drl_config) as results:
+        excel_path = args.output
+        pdf_path = os.path.splitext(excel_path)[0] + ".pdf"
+        write_excel(results.iter_chunks(), excel_path)
+        summary = dose_summary.combine(
+            dose_summary.summarize(chunk) for chunk in results.iter_chunks())
+        pdf_report.generate_pdf_report(
+            summary, pdf_path, drl_config,
+            pdf_report.format_date_range(args.date_from, args.date_to))
+        print(f"Processed {len(results)} files\nSaved to:\n{excel_path}\n{pdf_path}")
+
+
+def batch(args):
+    import pdf_report
+    from batch_reports import generate_batch_reports
+
+    with extract_records(args, DRLConfiguration()) as results:
+        index = generate_batch_reports(
+            results.iter_chunks(), args.output_dir, args.by,
+            pdf_report.format_date_range(args.date_from, args.date_to), args.workers)
+        print(f"Processed {len(results)} files into {len(index)} reports in {args.output_dir}")
+
+
+def print_estimate(estimate):
+    from progressive import format_ci
+
+    print(f"\n{estimate.describe()}")
+    print(f"{'Protocol':30} {'Mean DLP':>18} {'Mean CTDIvol':>16} {'DRL':>8} {'Deviation':>18} {'N':>6}")
+    for row in estimate.comparison():
+        print(f"{row['protocol'][:30]:30} "
+              f"{format_ci(row['avg_dlp'], row['dlp_ci']):>18} "
+              f"{format_ci(row['avg_ctdi'], row['ctdi_ci']):>16} "
+              f"{row['drl_level']:8.1f} "
+              f"{format_ci(row['percentage'], row['percentage_ci'], '%'):>18} "
+              f"{row['count']:6}")
+
+
+def progressive(args):
+    import dose_summary
+    import pdf_report
+    from failure_cache import FailureCache
+    from progressive import run_progressive
+    from spill_store import SpillStore, write_excel
+
+    drl_config = DRLConfiguration()
+    failures = FailureCache()
+    with (SpillStore(args.chunk_size) if args.chunk_size else SpillStore()) as results:
+        run_progressive(args.path, drl_config, print_estimate, not args.no_subdirs,
+                        parse_date(args.date_from) if args.date_from else None,
+                        parse_date(args.date_to) if args.date_to else None,
+                        results if args.output else None, failures, args.batch_size, args.timeout)
+        failures.save()
+        if args.output and len(results):
+            pdf_path = os.path.splitext(args.output)[0] + ".pdf"
+            write_excel(results.iter_chunks(), args.output)
+            summary = dose_summary.combine(
+                dose_summary.summarize(chunk) for chunk in results.iter_chunks())
+            pdf_report.generate_pdf_report(
+                summary, pdf_path, drl_config,
+                pdf_report.format_date_range(args.date_from, args.date_to))
+            print(f"Saved to:\n{args.output}\n{pdf_path}")
+
+
+def patients(args):
+    from patient_index import PatientIndex
+
+    patient_index = PatientIndex()
+    if patient_index.load_error:
+        print(patient_index.load_error, file=sys.stderr)
+    if not len(patient_index):
+        sys.exit("Patient index is empty, process files first")
+    end = parse_date(args.end) if args.end else None
+    period = f"last {args.months} months" if args.months else "all studies"
+
+    if args.id:
+        studies = patient_index.patient_studies(args.id)
+        if not studies:
+            sys.exit(f"No studies found for patient {args.id}")
+        print(f"{'Study Date':12} {'Protocol':30} {'Total DLP':>10} {'CTDIvol':>8}")
+        for study in studies:
+            study_date = study['StudyDate'].strftime('%d.%m.%Y') if study['StudyDate'] else ''
+            print(f"{study_date:12} {study['AcquisitionProtocol'][:30]:30} "
+                  f"{study['TotalDLP']:10.2f} {study['CTDIvol']:8.2f}")
+        total, count = patient_index.cumulative_dlp(args.id, args.months, end)
+        print(f"Cumulative DLP ({period}): {total:.2f} mGy*cm in {count} studies")
+    else:
+        high_dose_patients = patient_index.above_threshold(args.above, args.months, end)
+        print(f"{len(high_dose_patients)} patients with cumulative DLP >= {args.above} ({period})")
+        print(f"{'Patient ID':20} {'Cumulative DLP':>15} {'Studies':>8}")
+        for patient_id, total, count in high_dose_patients:
+            print(f"{patient_id:20} {total:15.2f} {count:8}")
+
+
+def drl(args):
+    drl_config = DRLConfiguration()
+    if args.action == 'import':
+        success, message = drl_config.import_from_excel(args.file)
+    else:
+        success, message = drl_config.export_to_excel(args.file)
+    if not success:
+        sys.exit(message)
+    print(message)
+
+
+def serve(args):
+    from query_service import run
+
+    try:
+        run(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+
+
+def quarantine(args):
+    from failure_cache import FailureCache
+
+    failures = FailureCache()
+    failures.write_report(args.output)
+    print(f"{len(failures)} unreadable files\nSaved to:\n{args.output}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CT DICOM SR Dose Data Reader")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scan_options = argparse.ArgumentParser(add_help=False)
+    scan_options.add_argument('path', help="directory or ZIP/TAR archive with DICOM SR files")
+    scan_options.add_argument('--from', dest='date_from', help="first StudyDate (dd.mm.yyyy)")
+    scan_options.add_argument('--to', dest='date_to', help="last StudyDate (dd.mm.yyyy)")
+    scan_options.add_argument('--no-subdirs', action='store_true', help="do not scan subdirectories")
+    scan_options.add_argument('--chunk-size', type=int,
+                              help="records kept in memory before spilling to disk (default 10000)")
+    scan_options.add_argument('--timeout', type=float, default=30,
+                              help="seconds a single file may take to read (default 30)")
+
+    report_parser = commands.add_parser('report', parents=[scan_options],
+                                        help="Excel and PDF report of all files")
+    report_parser.add_argument('-o', '--output', default="DICOM_SR_Report.xlsx",
+                               help="Excel file; the PDF is saved next to it")
+    report_parser.set_defaults(func=report)
+
+    batch_parser = commands.add_parser('batch', parents=[scan_options],
+                                       help="one report per scanner and/or month")
+    batch_parser.add_argument('-o', '--output-dir', default="reports")
+    batch_parser.add_argument('--by', choices=list(PARTITIONS), default='device_month')
+    batch_parser.add_argument('--workers', type=int, help="number of worker processes")
+    batch_parser.set_defaults(func=batch)
+
+    progressive_parser = commands.add_parser(
+        'progressive', parents=[scan_options],
+        help="DRL comparison from a random sample first, refined until all files are read")
+    progressive_parser.add_argument('--batch-size', type=int, default=500,
+                                    help="files read between two updates (default 500)")
+    progressive_parser.add_argument('-o', '--output',
+                                    help="also save the full Excel and PDF report at the end")
+    progressive_parser.set_defaults(func=progressive)
+
+    patients_parser = commands.add_parser(
+        'patients', help="cumulative DLP per patient from the patient index")
+    patient_query = patients_parser.add_mutually_exclusive_group(required=True)
+    patient_query.add_argument('--id', help="studies and cumulative DLP of one PatientID")
+    patient_query.add_argument('--above', type=float, metavar='DLP',
+                               help="patients with a cumulative DLP of at least DLP mGy*cm")
+    patients_parser.add_argument('--months', type=int, default=12,
+                                 help="window of the cumulative DLP (default 12, 0 = all studies)")
+    patients_parser.add_argument('--end', help="last day of the window (dd.mm.yyyy, default today)")
+    patients_parser.set_defaults(func=patients)
+
+    drl_parser = commands.add_parser('drl', help="import or export the DRL table (Excel or CSV)")
+    drl_parser.add_argument('action', choices=['import', 'export'])
+    drl_parser.add_argument('file', help=".xlsx or .csv file")
+    drl_parser.set_defaults(func=drl)
+
+    serve_parser = commands.add_parser(
+        'serve', help="local HTTP service answering JSON queries from the dose cube")
+    serve_parser.add_argument('--host', default='127.0.0.1',
+                              help="address to listen on (default 127.0.0.1, this computer only)")
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.set_defaults(func=serve)
+
+    quarantine_parser = commands.add_parser('quarantine', help="list files that could not be read")
+    quarantine_parser.add_argument('-o', '--output', default="DICOM_SR_Quarantine.csv")
+    quarantine_parser.set_defaults(func=quarantine)
+
+    args = parser.parse_args(argv)
+    for value in (getattr(args, 'date_from', None), getattr(args, 'date_to', None),
+                  getattr(args, 'end', None)):
+        if value:
+            try:
+                parse_date(value)
+            except argparse.ArgumentTypeError as e:
+                parser.error(str(e))
+    args.func(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
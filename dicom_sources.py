@@ -0,0 +1,228 @@
+# dicom_sources.py
+import io
+import os
+import tarfile
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+
+import pydicom
+
+from isolated_reader import IsolatedReader, FILE_TIMEOUT
+
+DICOM_EXTENSIONS = ('.dcm', '.DCM')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+MEMBER_SEPARATOR = '!'
+# ZIP archives kept open by a process reading their members
+MAX_OPEN_ZIPS = 8
+
+_open_zips = OrderedDict()
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def member_source(archive_path, member_name):
+    """Source string for a file inside an archive, e.g. 'export.zip!2024/01/IM1.dcm'"""
+    return f"{archive_path}{MEMBER_SEPARATOR}{member_name}"
+
+
+def split_source(source):
+    """Split a source string into (archive_path, member_name).
+
+    For plain files member_name is None.
+    """
+    lowered = source.lower()
+    for extension in ARCHIVE_EXTENSIONS:
+        marker = extension + MEMBER_SEPARATOR
+        index = lowered.find(marker)
+        if index != -1:
+            split_at = index + len(extension)
+            return source[:split_at], source[split_at + len(MEMBER_SEPARATOR):]
+    return source, None
+
+
+def display_name(source):
+    """Name used for the 'File' column of the report"""
+    archive_path, member_name = split_source(source)
+    if member_name is None:
+        return os.path.basename(source)
+    return f"{os.path.basename(archive_path)}{MEMBER_SEPARATOR}{member_name}"
+
+
+class ZipMember:
+    """A ZIP member that is only read when it is opened.
+
+    IsolatedReader opens it in the worker process, so reading the member (e.g.
+    from a stalled network mount) is covered by the time budget of the file.
+    """
+
+    def __init__(self, archive_path, member_name):
+        self.archive_path = archive_path
+        self.member_name = member_name
+
+    def open(self):
+        archive = _open_zips.pop(self.archive_path, None)
+        if archive is None:
+            archive = zipfile.ZipFile(self.archive_path)
+            while len(_open_zips) >= MAX_OPEN_ZIPS:
+                _open_zips.popitem(last=False)[1].close()
+        _open_zips[self.archive_path] = archive
+        return io.BytesIO(archive.read(self.member_name))
+
+
+def iter_archive_members(archive_path, member_names=None):
+    """Yield (member_name, file) for every DICOM member of a ZIP or tar archive.
+
+    Members are streamed one at a time, so memory use is bounded by the size of
+    the largest member and not by the size of the archive. If member_names is
+    given, only those members are returned. Errors opening or walking the
+    archive are raised.
+
+    ZIP members are returned as ZipMember, read later by the worker. A tar
+    can only be read sequentially, so its members are read here, as file
+    objects, in the calling process: the per-file time budget does not cover
+    them, and a tar on a stalled mount still blocks the run. A tar member that
+    cannot be read is returned with the exception instead of a file object.
+    """
+    if zipfile.is_zipfile(archive_path):
+        for member_name in zip_member_names(archive_path, member_names):
+            yield member_name, ZipMember(archive_path, member_name)
+    else:
+        # Stream mode reads the (possibly compressed) tar sequentially without seeking
+        with tarfile.open(archive_path, 'r|*') as archive:
+            for info in archive:
+                if not info.isfile() or not _is_wanted_member(info.name, member_names):
+                    archive.members = []
+                    continue
+                try:
+                    member = io.BytesIO(archive.extractfile(info).read())
+                except Exception as e:
+                    member = e
+                yield info.name, member
+                # TarFile keeps every TarInfo it has read, also in stream mode
+                archive.members = []
+
+
+def iter_archive_sources(archive_path, member_names=None):
+    """Yield (source, file) for the DICOM members of an archive.
+
+    An archive that cannot be read (corrupt, truncated or not an archive at
+    all) ends with (archive_path, exception), so that the caller can record it
+    as failed and go on with the next file instead of stopping the run.
+    """
+    try:
+        for member_name, member in iter_archive_members(archive_path, member_names):
+            yield member_source(archive_path, member_name), member
+    except Exception as e:
+        yield archive_path, e
+
+
+def zip_member_names(archive_path, member_names=None):
+    """Names of the DICOM members of a ZIP archive, read from its central directory"""
+    with zipfile.ZipFile(archive_path) as archive:
+        return [info.filename for info in archive.infolist()
+                if not info.is_dir() and _is_wanted_member(info.filename, member_names)]
+
+
+def _is_wanted_member(name, member_names):
+    if member_names is not None:
+        return name in member_names
+    return name.endswith(DICOM_EXTENSIONS)
+
+
+def _walk_files(path, recursive=True):
+    if os.path.isfile(path):
+        yield path
+    elif recursive:
+        for root, _, files in os.walk(path):
+            for file in files:
+                yield os.path.join(root, file)
+    else:
+        for file in os.listdir(path):
+            file_path = os.path.join(path, file)
+            if os.path.isfile(file_path):
+                yield file_path
+
+
+def list_files(path, recursive=True):
+    """(DICOM files, archives) under path, without reading any of them"""
+    dicom_files = []
+    archives = []
+    for file_path in _walk_files(path, recursive):
+        if file_path.endswith(DICOM_EXTENSIONS):
+            dicom_files.append(file_path)
+        elif is_archive(file_path):
+            archives.append(file_path)
+    return dicom_files, archives
+
+
+def iter_sources(path, recursive=True):
+    """Yield (source, file) pairs for all candidate DICOM files under path.
+
+    path can be a directory or an archive. Archives found inside a directory are
+    read as well. file is a file system path, a ZipMember or file object for
+    archive members (see iter_archive_members), or the exception raised reading
+    an archive or member (see iter_archive_sources).
+    """
+    for file_path in _walk_files(path, recursive):
+        if file_path.endswith(DICOM_EXTENSIONS):
+            yield file_path, file_path
+        elif is_archive(file_path):
+            yield from iter_archive_sources(file_path)
+
+
+def iter_source_files(sources):
+    """Yield (source, file) for sources previously returned by find_dicom_files.
+
+    Members of the same archive are read in a single streaming pass over the archive.
+    """
+    archives = {}
+    for source in sources:
+        archive_path, member_name = split_source(source)
+        if member_name is not None:
+            archives.setdefault(archive_path, set()).add(member_name)
+
+    for source in sources:
+        archive_path, member_name = split_source(source)
+        if member_name is None:
+            yield source, source
+        elif archive_path in archives:
+            yield from iter_archive_sources(archive_path, archives.pop(archive_path))
+
+
+def read_study_date(file_path, file=None):
+    """StudyDate of a DICOM file as a date (None if the file has no StudyDate)"""
+    dcm = pydicom.dcmread(file if file is not None else file_path, specific_tags=['StudyDate'])
+    study_date = dcm.get('StudyDate', '')
+    if not study_date:
+        return None
+    return datetime.strptime(study_date, '%Y%m%d').date()
+
+
+def find_dicom_files(path, recursive=True, date_from=None, date_to=None, failures=None,
+                     timeout=FILE_TIMEOUT):
+    """Return sources of DICOM files under path with a StudyDate inside the date range.
+
+    Files are read in worker processes with a time budget per file. Files that
+    cannot be read are recorded in failures (a FailureCache), and files already
+    known to be bad are skipped.
+    """
+    files = iter_sources(path, recursive)
+    if failures is not None:
+        files = failures.filter(files)
+
+    dicom_files = []
+    with IsolatedReader(read_study_date, timeout) as reader:
+        for source, file_date, error in reader.imap(files):
+            if error:
+                if failures is not None:
+                    failures.record(source, *error)
+                continue
+            if failures is not None:
+                failures.clear(source)
+            if file_date and ((not date_from or file_date >= date_from) and
+                              (not date_to or file_date <= date_to)):
+                dicom_files.append(source)
+    return dicom_files
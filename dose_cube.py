@@ -0,0 +1,107 @@
+# dose_cube.py
+import pandas as pd
+
+import dose_summary
+from index_file import load_index, save_index
+from record_keys import RecordKeySet, record_keys
+
+CUBE_FILE = "dose_cube.pkl"
+# Changed whenever the pickled layout changes; older files are set aside
+FORMAT_VERSION = 2
+# StudyDate is stored per day; 'Month' can be used as a derived dimension in rollup()
+KEYS = ['StudyDate'] + dose_summary.KEYS + ['DRLProtocol']
+
+
+class DoseCube:
+    """Pre-aggregated dose data for fast reports over arbitrary filters.
+
+    Dimensions are study day, DeviceObserverModelName, AcquisitionProtocol,
+    CalculatedAge (one year bins), adult weight category and the matched DRL
+    protocol. For every cell the record count and the sum and non-null count of
+    TotalDLP and CTDIvol are kept, so means can be computed for any roll-up.
+    SRs already added are remembered by SOPInstanceUID (see record_keys) and
+    skipped on later runs, also when they are read from another path.
+    """
+
+    def __init__(self, file_path=CUBE_FILE):
+        self.file_path = file_path
+        self.load()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def load(self):
+        """Load the saved cube; load_error tells why an unreadable file was replaced"""
+        data, self.load_error = load_index(self.file_path, FORMAT_VERSION)
+        if data is None:
+            self.cells = dose_summary.empty_summary(KEYS)
+            self.keys = RecordKeySet()
+        else:
+            self.cells = data['cells']
+            self.keys = data['keys']
+
+    def save(self):
+        save_index(self.file_path, FORMAT_VERSION, {'cells': self.cells, 'keys': self.keys})
+
+    def add(self, df, drl_config):
+        """Add a chunk of extracted records; returns the number of new records"""
+        keys = record_keys(df)
+        new = self.keys.new_mask(keys)
+        df = df[new]
+        if len(df) == 0:
+            return 0
+        df = df.assign(DRLProtocol=self.match_drl_protocols(df['AcquisitionProtocol'], drl_config))
+        self.cells = dose_summary.combine([self.cells, dose_summary.summarize(df, KEYS)], KEYS)
+        self.keys.add(keys[new])
+        return len(df)
+
+    def rematch(self, drl_config):
+        """Update the DRL protocol dimension after the DRL configuration has changed"""
+        self.cells['DRLProtocol'] = self.match_drl_protocols(self.cells['AcquisitionProtocol'], drl_config)
+        self.cells = dose_summary.combine([self.cells], KEYS)
+
+    @staticmethod
+    def match_drl_protocols(protocols, drl_config):
+        matches = {}
+        for protocol in pd.unique(protocols):
+            drl_protocol, _ = drl_config.get_matching_protocol(str(protocol))
+            matches[protocol] = drl_protocol or ''
+        return protocols.map(matches).astype(object)
+
+    def select(self, date_from=None, date_to=None, devices=None, protocols=None,
+               drl_protocols=None, age_min=None, age_max=None, weight_categories=None):
+        """Cells matching the filters; dates are inclusive, None means no filter"""
+        cells = self.cells
+        mask = pd.Series(True, index=cells.index)
+        if date_from:
+            mask &= cells['StudyDate'] >= pd.Timestamp(date_from)
+        if date_to:
+            mask &= cells['StudyDate'] <= pd.Timestamp(date_to)
+        if devices is not None:
+            mask &= cells['DeviceObserverModelName'].isin(devices)
+        if protocols is not None:
+            mask &= cells['AcquisitionProtocol'].isin(protocols)
+        if drl_protocols is not None:
+            mask &= cells['DRLProtocol'].isin(drl_protocols)
+        if age_min is not None:
+            mask &= (cells['CalculatedAge'] >= age_min).fillna(False)
+        if age_max is not None:
+            mask &= (cells['CalculatedAge'] <= age_max).fillna(False)
+        if weight_categories is not None:
+            mask &= cells['WeightCategory'].isin(weight_categories)
+        return cells[mask]
+
+    def query(self, **filters):
+        """Summary of the matching cells, as used by calculate_drl_comparison and
+        generate_pdf_report. Accepts the same filters as select()."""
+        return dose_summary.combine([self.select(**filters)])
+
+    def rollup(self, by, **filters):
+        """Count, sums and means of the matching cells grouped by the dimensions in by.
+
+        Besides the cube dimensions, 'Month' and 'Year' can be used.
+        """
+        cells = self.select(**filters)
+        cells = cells.assign(Month=cells['StudyDate'].dt.to_period('M'),
+                             Year=cells['StudyDate'].dt.year)
+        return dose_summary.aggregate(cells, by)
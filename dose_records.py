@@ -0,0 +1,203 @@
+# dose_records.py
+from array import array
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pydicom
+
+import dicom_sources
+from isolated_reader import IsolatedReader, FILE_TIMEOUT
+
+# Column order of the extracted data (and of the Excel report)
+COLUMNS = [
+    'File', 'Modality', 'Manufacturer', 'DeviceObserverModelName', 'PatientName',
+    'PatientID', 'PatientSex', 'PatientBirthDate', 'PatientAge', 'PatientWeight',
+    'StudyDate', 'StudyDescription', 'AcquisitionProtocol', 'TotalDLP', 'CTDIvol',
+    'CalculatedAge'
+]
+# Full path (or archive!member) of the source file; kept with the records but not exported
+SOURCE_COLUMN = 'Source'
+# Identifies the SR independent of the path it was read from; not exported either
+UID_COLUMN = 'SOPInstanceUID'
+
+# Columns with a handful of distinct values, stored as pandas categoricals
+CATEGORICAL_COLUMNS = ('Modality', 'Manufacturer', 'DeviceObserverModelName',
+                       'PatientSex', 'StudyDescription', 'AcquisitionProtocol')
+# DICOM DA values ('YYYYMMDD'), stored as datetime64 columns
+DATE_COLUMNS = ('PatientBirthDate', 'StudyDate')
+FLOAT_COLUMNS = ('PatientWeight', 'TotalDLP', 'CTDIvol')
+TEXT_COLUMNS = ('File', 'PatientName', 'PatientID', 'PatientAge', SOURCE_COLUMN, UID_COLUMN)
+
+
+class DoseRecord:
+    """Dose data of a single DICOM SR file"""
+    __slots__ = ('File', 'Modality', 'Manufacturer', 'DeviceObserverModelName',
+                 'PatientName', 'PatientID', 'PatientSex', 'PatientBirthDate',
+                 'PatientAge', 'PatientWeight', 'StudyDate', 'StudyDescription',
+                 'AcquisitionProtocol', 'TotalDLP', 'CTDIvol', 'Source', 'SOPInstanceUID')
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+
+class DoseRecordBuilder:
+    """Collects DoseRecords column by column and turns them into a DataFrame.
+
+    Numbers and dates are kept in typed arrays and repeated strings are stored
+    once with an integer code per row, so a record costs a few dozen bytes
+    instead of a dict with 16 Python objects.
+    """
+
+    def __init__(self):
+        self.codes = {name: array('i') for name in CATEGORICAL_COLUMNS}
+        self.categories = {name: {} for name in CATEGORICAL_COLUMNS}
+        self.dates = {name: array('l') for name in DATE_COLUMNS}
+        self.floats = {name: array('d') for name in FLOAT_COLUMNS}
+        self.texts = {name: [] for name in TEXT_COLUMNS}
+
+    def __len__(self):
+        return len(self.texts['File'])
+
+    def append(self, record):
+        for name in CATEGORICAL_COLUMNS:
+            value = getattr(record, name) or ''
+            categories = self.categories[name]
+            code = categories.get(value)
+            if code is None:
+                code = categories[value] = len(categories)
+            self.codes[name].append(code)
+
+        for name in DATE_COLUMNS:
+            self.dates[name].append(parse_dicom_date(getattr(record, name)))
+
+        for name in FLOAT_COLUMNS:
+            value = getattr(record, name)
+            try:
+                self.floats[name].append(float(value) if value not in (None, '') else np.nan)
+            except (TypeError, ValueError):
+                self.floats[name].append(np.nan)
+
+        for name in TEXT_COLUMNS:
+            value = getattr(record, name)
+            self.texts[name].append(str(value) if value is not None else '')
+
+    def to_dataframe(self):
+        columns = {}
+        for name in TEXT_COLUMNS:
+            columns[name] = self.texts[name]
+        for name in CATEGORICAL_COLUMNS:
+            columns[name] = pd.Categorical.from_codes(
+                np.frombuffer(self.codes[name], dtype=np.int32) if len(self) else [],
+                categories=list(self.categories[name]))
+        for name in FLOAT_COLUMNS:
+            columns[name] = np.frombuffer(self.floats[name], dtype=np.float64) if len(self) else []
+        for name in DATE_COLUMNS:
+            columns[name] = dates_from_ints(self.dates[name])
+
+        df = pd.DataFrame(columns)
+        df['CalculatedAge'] = calculate_age(df['PatientBirthDate'], df['StudyDate'])
+        return df[COLUMNS + [SOURCE_COLUMN, UID_COLUMN]]
+
+
+def parse_dicom_date(value):
+    """'YYYYMMDD' -> YYYYMMDD as int, 0 if the value is missing or malformed"""
+    value = str(value or '').strip()
+    if len(value) == 8 and value.isdigit():
+        return int(value)
+    return 0
+
+
+def dates_from_ints(values):
+    """Vectorized conversion of YYYYMMDD ints to a datetime64 column (NaT for 0)"""
+    values = np.asarray(values, dtype=np.int64)
+    return pd.to_datetime(pd.DataFrame({
+        'year': values // 10000,
+        'month': values // 100 % 100,
+        'day': values % 100
+    }), errors='coerce')
+
+
+def calculate_age(birth_dates, study_dates):
+    """Age in full years at the study date; studies without a date count as today"""
+    study_dates = study_dates.fillna(pd.Timestamp(date.today()))
+    return ((study_dates - birth_dates).dt.days // 365).astype('Int64')
+
+
+def process_content_sequence(sequence, record):
+    if not sequence:
+        return
+
+    for content_item in sequence:
+        if hasattr(content_item, 'ConceptNameCodeSequence'):
+            concept_name = content_item.ConceptNameCodeSequence[0].CodeMeaning
+
+            if 'Acquisition Protocol' in concept_name and hasattr(content_item, 'TextValue'):
+                record.AcquisitionProtocol = str(content_item.TextValue)
+            elif 'Mean CTDIvol' in concept_name and hasattr(content_item, 'MeasuredValueSequence'):
+                try:
+                    record.CTDIvol = float(content_item.MeasuredValueSequence[0].NumericValue)
+                except:
+                    pass
+            elif 'DLP' in concept_name and hasattr(content_item, 'MeasuredValueSequence'):
+                try:
+                    record.TotalDLP = float(content_item.MeasuredValueSequence[0].NumericValue)
+                except:
+                    pass
+
+        if hasattr(content_item, 'ContentSequence'):
+            process_content_sequence(content_item.ContentSequence, record)
+
+
+def extract_patient_dose_data(file_path, file=None):
+    """DoseRecord of a DICOM SR file, None for other modalities.
+
+    Read errors are raised, so that the caller can record the file as failed.
+    """
+    dcm = pydicom.dcmread(file if file is not None else file_path)
+
+    if dcm.get('Modality', '') != 'SR':
+        return None
+
+    record = DoseRecord(
+        File=dicom_sources.display_name(file_path),
+        Modality=dcm.get('Modality', ''),
+        Manufacturer=dcm.get('Manufacturer', ''),
+        DeviceObserverModelName=dcm.get('DeviceObserverModelName', ''),
+        PatientName=str(dcm.get('PatientName', '')),
+        PatientID=dcm.get('PatientID', ''),
+        PatientSex=dcm.get('PatientSex', ''),
+        PatientBirthDate=dcm.get('PatientBirthDate', ''),
+        PatientAge=dcm.get('PatientAge', ''),
+        PatientWeight=dcm.get('PatientWeight', None),
+        StudyDate=dcm.get('StudyDate', ''),
+        StudyDescription=dcm.get('StudyDescription', ''),
+        AcquisitionProtocol='',
+        Source=file_path,
+        SOPInstanceUID=dcm.get('SOPInstanceUID', '')
+    )
+
+    if hasattr(dcm, 'ContentSequence'):
+        process_content_sequence(dcm.ContentSequence, record)
+
+    return record
+
+
+def extract_records(files, results, failures=None, timeout=FILE_TIMEOUT):
+    """Extract DoseRecords of (source, file) pairs into results (e.g. a SpillStore).
+
+    Files are read in worker processes with a time budget per file; files that
+    fail are recorded in failures (a FailureCache) instead of being printed.
+    """
+    with IsolatedReader(extract_patient_dose_data, timeout) as reader:
+        for source, record, error in reader.imap(files):
+            if error:
+                if failures is not None:
+                    failures.record(source, *error)
+                continue
+            if failures is not None:
+                failures.clear(source)
+            if record:
+                results.append(record)
+    return results
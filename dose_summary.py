@@ -0,0 +1,177 @@
+# dose_summary.py
+import pandas as pd
+
+# Group keys of a summary; together they are enough for every table of the PDF report
+KEYS = ['AcquisitionProtocol', 'DeviceObserverModelName', 'CalculatedAge', 'WeightCategory']
+MEASURES = ['TotalDLP', 'CTDIvol']
+# Additive columns kept for every group
+TOTALS = ['count'] + [f'{measure}_{total}' for measure in MEASURES for total in ('sum', 'n')]
+
+WEIGHT_RANGES = [
+    (40, 50, "40kg - 50kg"),
+    (50, 60, "50kg - 60kg"),
+    (60, 70, "60kg - 70kg"),
+    (70, 80, "70kg - 80kg"),
+    (80, 90, "80kg - 90kg"),
+    (90, 100, "90kg - 100kg"),
+    (100, float('inf'), "Virs 100kg")
+]
+
+
+def weight_category(weights):
+    """Label of the adult weight range for every weight ('' if not in any range)"""
+    bins = [weight_min for weight_min, _, _ in WEIGHT_RANGES] + [float('inf')]
+    labels = [label for _, _, label in WEIGHT_RANGES]
+    categories = pd.cut(weights, bins=bins, labels=labels, right=False)
+    return categories.astype(object).fillna('')
+
+
+def summarize(df, keys=KEYS):
+    """Reduce extracted records to count, sum and non-null count per group.
+
+    Summaries of different chunks can be added together with combine(), so the
+    report never needs all records in memory at once.
+    """
+    df = df.assign(WeightCategory=weight_category(df['PatientWeight']))
+    data = {key: df[key].astype(object) if isinstance(df[key].dtype, pd.CategoricalDtype) else df[key]
+            for key in keys}
+    data['count'] = 1
+    for measure in MEASURES:
+        data[f'{measure}_sum'] = df[measure].fillna(0)
+        data[f'{measure}_n'] = df[measure].notna().astype('int64')
+    return (pd.DataFrame(data)
+            .groupby(keys, dropna=False, sort=False)
+            .sum()
+            .reset_index())
+
+
+def combine(summaries, keys=KEYS):
+    """Add up summaries of several chunks"""
+    combined = None
+    for summary in summaries:
+        summary = summary[list(keys) + TOTALS]
+        if combined is not None:
+            summary = pd.concat([combined, summary], ignore_index=True)
+        combined = (summary.groupby(keys, dropna=False, sort=False)
+                    .sum()
+                    .reset_index())
+    if combined is None:
+        combined = empty_summary(keys)
+    return combined
+
+
+def empty_summary(keys=KEYS):
+    summary = pd.DataFrame({key: pd.Series(dtype=object) for key in keys})
+    for total in TOTALS:
+        summary[total] = pd.Series(dtype='float64' if total.endswith('_sum') else 'int64')
+    if 'CalculatedAge' in keys:
+        summary['CalculatedAge'] = summary['CalculatedAge'].astype('Int64')
+    if 'StudyDate' in keys:
+        summary['StudyDate'] = pd.to_datetime(summary['StudyDate'])
+    return summary
+
+
+def aggregate(summary, by):
+    """Group a summary by the columns in `by` and compute mean values and counts"""
+    grouped = summary.groupby(by, sort=True)[TOTALS].sum()
+    for measure in MEASURES:
+        grouped[measure] = grouped[f'{measure}_sum'] / grouped[f'{measure}_n'].where(
+            grouped[f'{measure}_n'] > 0)
+    return grouped
+
+
+def drl_comparison(summary, drl_config):
+    """DRL comparison rows for the report"""
+    comparison_data = []
+
+    grouped_stats = aggregate(summary, 'AcquisitionProtocol')[MEASURES].round(2)
+    devices = summary.groupby('AcquisitionProtocol', sort=True)['DeviceObserverModelName'].first()
+    child_ages = summary.loc[summary['CalculatedAge'] <= 18, 'CalculatedAge'].dropna().unique()
+
+    for protocol, stats in grouped_stats.iterrows():
+        # Find matching DRL protocol
+        drl_protocol, drl_data = drl_config.get_matching_protocol(protocol)
+
+        # Only include protocols that have matching DRL values
+        if drl_data and any(pattern.lower() in protocol.lower()
+                           for pattern in drl_data['protocol_match']):
+            # Get appropriate DRL value
+            if len(child_ages) > 0:
+                # For children, find appropriate age range
+                for age_range, values in drl_data['child'].items():
+                    min_age, max_age = map(int, age_range.split('-'))
+                    if any(min_age <= age <= max_age for age in child_ages):
+                        drl_level = values['DLP']
+                        break
+                else:
+                    drl_level = drl_data['adult']['DLP']
+            else:
+                drl_level = drl_data['adult']['DLP']
+
+            # Calculate percentage and determine status
+            percentage = (stats['TotalDLP'] / drl_level) * 100
+            relative_percentage = percentage - 100  # Novirze no 100%
+
+            if percentage <= 85:
+                status = "Optimals"
+                color = "#90EE90"  # Light green
+            elif percentage <= 100:
+                status = "Pienemams"
+                color = "#FFD700"  # Gold
+            else:
+                status = "Parsniegts"
+                color = "#FFB6C6"  # Light red
+
+            comparison_data.append({
+                'protocol': protocol,
+                'device_model': devices[protocol],
+                'avg_dlp': stats['TotalDLP'],
+                'avg_ctdi': stats['CTDIvol'],
+                'drl_level': drl_level,
+                'percentage': relative_percentage,
+                'status': status,
+                'color': color
+            })
+
+    return comparison_data
+
+
+def children_data(summary):
+    """Rows of the 'Berni (0-18 gadi)' table"""
+    rows = []
+    children = summary[summary['CalculatedAge'] <= 18]
+    if len(children) > 0:
+        stats = aggregate(children, ['AcquisitionProtocol', 'CalculatedAge'])
+        for (protocol, age), row in stats.iterrows():
+            rows.append({
+                'protocol': protocol,
+                'age': age,
+                'dlp': row['TotalDLP'],
+                'ctdi': row['CTDIvol'],
+                'count': int(row['count'])
+            })
+    return rows
+
+
+def adult_categories(summary):
+    """Adult tables, one per weight range"""
+    categories = []
+    adults = summary[summary['CalculatedAge'] > 18]
+    for _, _, weight_label in WEIGHT_RANGES:
+        weight_df = adults[adults['WeightCategory'] == weight_label]
+        if len(weight_df) > 0:
+            category_data = {
+                'label': weight_label,
+                'data': []
+            }
+            stats = aggregate(weight_df, ['AcquisitionProtocol', 'DeviceObserverModelName'])
+            for (protocol, device_model), row in stats.iterrows():
+                category_data['data'].append({
+                    'protocol': protocol,
+                    'device_model': device_model,
+                    'dlp': row['TotalDLP'],
+                    'ctdi': row['CTDIvol'],
+                    'count': int(row['count'])
+                })
+            categories.append(category_data)
+    return categories
@@ -1,11 +1,38 @@
 # drl_config.py
 import json
-import pandas as pd
+import os
+from contextlib import contextmanager
+
+AGE_RANGES = ['0-1', '1-5', '5-10', '10-15']
+
+_shared_config = None
+
+
+def shared_config():
+    """The DRLConfiguration shared by the windows of the running application.
+
+    It is not saved after every change; the windows call flush() once edits
+    pause and when they are closed.
+    """
+    global _shared_config
+    if _shared_config is None:
+        _shared_config = DRLConfiguration(autosave=False)
+    return _shared_config
+
 
 class DRLConfiguration:
-    def __init__(self):
+    # self.protocols is never changed in place: the changes of a batch are made
+    # to a copy (self.draft) that replaces it when the batch ends, so other
+    # threads (e.g. the progressive preview) can iterate over the dict they got
+    # while the DRL table is edited in the GUI.
+    def __init__(self, autosave=True):
         self.protocols = {}
         self.config_file = "drl_config.json"
+        self.autosave = autosave
+        self.listeners = []
+        self.batch_depth = 0
+        self.draft = None
+        self.dirty = False
         self.load_config()
     
     def load_config(self):
@@ -17,17 +44,62 @@ class DRLConfiguration:
             self.protocols = {}
     
     def save_config(self):
-        with open(self.config_file, 'w', encoding='utf-8') as f:
+        # Written to a temporary file first, so a crash never leaves a truncated config
+        temp_path = self.config_file + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
             json.dump(self.protocols, f, indent=4, ensure_ascii=False)
+        os.replace(temp_path, self.config_file)
+    
+    def subscribe(self, listener):
+        """Call listener(drl_config) after every change of the configuration"""
+        self.listeners.append(listener)
+    
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+    
+    def flush(self):
+        """Write the configuration file if it has changes not written yet"""
+        if self.dirty:
+            self.save_config()
+            self.dirty = False
+    
+    @contextmanager
+    def batch(self):
+        """Group changes: they take effect and listeners are notified once at the end.
+
+        The protocols are copied once per batch, so adding thousands of them in
+        one batch is not quadratic. With autosave the file is written at the
+        end of the batch, otherwise by flush().
+        """
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0 and self.draft is not None:
+                self.protocols = self.draft
+                self.draft = None
+                self.dirty = True
+                for listener in list(self.listeners):
+                    listener(self)
+                if self.autosave:
+                    self.flush()
+    
+    def _draft(self):
+        """The protocols as changed in the current batch"""
+        if self.draft is None:
+            self.draft = dict(self.protocols)
+        return self.draft
     
     def add_protocol(self, name, data):
-        self.protocols[name] = data
-        self.save_config()
+        with self.batch():
+            self._draft()[name] = data
     
     def delete_protocol(self, name):
-        if name in self.protocols:
-            del self.protocols[name]
-            self.save_config()
+        with self.batch():
+            if name in (self.draft if self.draft is not None else self.protocols):
+                del self._draft()[name]
     
     def get_protocol(self, name):
         return self.protocols.get(name, None)
@@ -37,62 +109,87 @@ class DRLConfiguration:
 
     def get_matching_protocol(self, protocol_name):
         for protocol, data in self.protocols.items():
-            if any(pattern.lower() in protocol_name.lower() 
+            if any(pattern.lower() in protocol_name.lower()
                   for pattern in data['protocol_match']):
                 return protocol, data
         return None, None
 
     def import_from_excel(self, file_path):
+        """Replace all protocols with the rows of an Excel (or CSV) DRL table.
+
+        The table is converted column by column, so national tables with
+        thousands of protocols import in one pass and one write.
+        """
+        # pandas is only needed here and in export_to_excel, so it is not
+        # imported at startup
+        import pandas as pd
         try:
-            df = pd.read_excel(file_path)
-            new_protocols = {}
+            if file_path.lower().endswith('.csv'):
+                df = pd.read_csv(file_path, float_precision='round_trip')
+            else:
+                df = pd.read_excel(file_path)
+            
+            missing = df.loc[df['Match Patterns'].isna(), 'Protocol']
+            if len(missing):
+                raise ValueError(f"Match Patterns missing for {', '.join(map(str, missing))}")
             
-            for _, row in df.iterrows():
-                protocol_data = {
-                    'protocol_match': [x.strip() for x in row['Match Patterns'].split(',')],
-                    'adult': {
-                        'DLP': float(row['Adult DLP']),
-                        'CTDIvol': float(row['Adult CTDIvol'])
-                    },
-                    'child': {}
+            columns = [
+                df['Protocol'].astype(str),
+                df['Match Patterns'].astype(str).str.split(',').map(
+                    lambda patterns: [x.strip() for x in patterns]),
+                df['Adult DLP'].astype(float),
+                df['Adult CTDIvol'].astype(float)
+            ]
+            # Children columns are looked up once for the whole table
+            age_ranges = [age_range for age_range in AGE_RANGES
+                          if f'Child {age_range} DLP' in df and f'Child {age_range} CTDIvol' in df]
+            for age_range in age_ranges:
+                columns.append(df[f'Child {age_range} DLP'].astype(float))
+                columns.append(df[f'Child {age_range} CTDIvol'].astype(float))
+            
+            new_protocols = {}
+            for name, patterns, adult_dlp, adult_ctdi, *child_values in zip(
+                    *(column.tolist() for column in columns)):
+                child = {}
+                for age_range, dlp, ctdi in zip(age_ranges, child_values[::2], child_values[1::2]):
+                    # Empty cells mean there is no DRL for this age range
+                    if dlp == dlp and ctdi == ctdi:
+                        child[age_range] = {'DLP': dlp, 'CTDIvol': ctdi}
+                new_protocols[name] = {
+                    'protocol_match': patterns,
+                    'adult': {'DLP': adult_dlp, 'CTDIvol': adult_ctdi},
+                    'child': child
                 }
-                
-                # Process children data
-                age_ranges = ['0-1', '1-5', '5-10', '10-15']
-                for age_range in age_ranges:
-                    if f'Child {age_range} DLP' in row and f'Child {age_range} CTDIvol' in row:
-                        protocol_data['child'][age_range] = {
-                            'DLP': float(row[f'Child {age_range} DLP']),
-                            'CTDIvol': float(row[f'Child {age_range} CTDIvol'])
-                        }
-                
-                new_protocols[row['Protocol']] = protocol_data
             
-            self.protocols = new_protocols
-            self.save_config()
-            return True, "Import successful"
+            with self.batch():
+                self.draft = new_protocols
+            return True, f"Imported {len(new_protocols)} protocols"
         except Exception as e:
             return False, str(e)
     
     def export_to_excel(self, file_path):
+        """Write all protocols as an Excel (or CSV) table, as read by import_from_excel"""
+        import pandas as pd
         try:
-            data = []
-            for protocol_name, protocol_data in self.protocols.items():
-                row = {
-                    'Protocol': protocol_name,
-                    'Match Patterns': ','.join(protocol_data['protocol_match']),
-                    'Adult DLP': protocol_data['adult']['DLP'],
-                    'Adult CTDIvol': protocol_data['adult']['CTDIvol']
-                }
-                
-                for age_range, values in protocol_data['child'].items():
-                    row[f'Child {age_range} DLP'] = values['DLP']
-                    row[f'Child {age_range} CTDIvol'] = values['CTDIvol']
-                
-                data.append(row)
+            protocols = self.protocols
+            data = {
+                'Protocol': list(protocols),
+                'Match Patterns': [','.join(p['protocol_match']) for p in protocols.values()],
+                'Adult DLP': [p['adult']['DLP'] for p in protocols.values()],
+                'Adult CTDIvol': [p['adult']['CTDIvol'] for p in protocols.values()]
+            }
+            age_ranges = {age_range for p in protocols.values() for age_range in p['child']}
+            for age_range in AGE_RANGES + sorted(age_ranges - set(AGE_RANGES)):
+                if age_range in age_ranges:
+                    for measure in ('DLP', 'CTDIvol'):
+                        data[f'Child {age_range} {measure}'] = [
+                            p['child'].get(age_range, {}).get(measure) for p in protocols.values()]
             
             df = pd.DataFrame(data)
-            df.to_excel(file_path, index=False)
+            if file_path.lower().endswith('.csv'):
+                df.to_csv(file_path, index=False)
+            else:
+                df.to_excel(file_path, index=False)
             return True, "Export successful"
         except Exception as e:
-            return False, str(e)
\ No newline at end of file
+            return False, str(e)
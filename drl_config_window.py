@@ -1,11 +1,16 @@
 # drl_config_window.py
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from drl_config import DRLConfiguration
+from drl_config import AGE_RANGES, shared_config
+
+# Milliseconds without edits before the configuration file is written
+SAVE_DELAY = 2000
 
 class DRLConfigWindow:
-    def __init__(self, parent):
-        self.drl_config = DRLConfiguration()
+    def __init__(self, parent, drl_config=None):
+        # Edits go to the configuration used by the application, not to a copy
+        self.drl_config = drl_config or shared_config()
+        self.save_job = None
         self.window = tk.Toplevel(parent)
         self.window.title("DRL Configuration")
         self.window.geometry("800x600")
@@ -62,10 +67,9 @@ class DRLConfigWindow:
         child_frame = ttk.LabelFrame(config_frame, text="Children DRL Values", padding="5")
         child_frame.pack(fill=tk.X, pady=5)
         
-        age_ranges = ["0-1", "1-5", "5-10", "10-15"]
         self.child_entries = {}
         
-        for i, age_range in enumerate(age_ranges):
+        for i, age_range in enumerate(AGE_RANGES):
             ttk.Label(child_frame, text=f"Age {age_range}:").grid(row=i, column=0, padx=5, pady=2)
             
             ttk.Label(child_frame, text="DLP:").grid(row=i, column=1, padx=5)
@@ -86,13 +90,36 @@ class DRLConfigWindow:
         ttk.Button(button_frame, text="Import from Excel", command=self.import_excel).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Export to Excel", command=self.export_excel).pack(side=tk.LEFT, padx=5)
         
-        # Load existing protocols
+        # Load existing protocols and follow changes made elsewhere
         self.load_protocols()
+        self.drl_config.subscribe(self.on_config_changed)
+        self.window.bind('<Destroy>', self.on_destroy)
             
     def load_protocols(self):
         self.protocol_list.delete(0, tk.END)
-        for protocol in self.drl_config.get_all_protocols():
-            self.protocol_list.insert(tk.END, protocol)
+        # One insert call for the whole list, national tables have thousands of protocols
+        self.protocol_list.insert(tk.END, *self.drl_config.get_all_protocols())
+            
+    def on_config_changed(self, drl_config):
+        self.load_protocols()
+        # The file is written once the edits pause, not after every change
+        if self.save_job is not None:
+            self.window.after_cancel(self.save_job)
+        self.save_job = self.window.after(SAVE_DELAY, self.flush)
+            
+    def flush(self):
+        self.save_job = None
+        try:
+            self.drl_config.flush()
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save DRL configuration: {e}")
+            
+    def on_destroy(self, event):
+        if event.widget is self.window:
+            self.drl_config.unsubscribe(self.on_config_changed)
+            if self.save_job is not None:
+                self.window.after_cancel(self.save_job)
+            self.flush()
             
     def save_changes(self):
         protocol_name = self.protocol_name.get().strip()
@@ -118,7 +145,6 @@ class DRLConfigWindow:
                     }
                     
             self.drl_config.add_protocol(protocol_name, data)
-            self.load_protocols()
             messagebox.showinfo("Success", "Protocol saved successfully")
             
         except ValueError as e:
@@ -126,12 +152,11 @@ class DRLConfigWindow:
             
     def import_excel(self):
         file_path = filedialog.askopenfilename(
-            filetypes=[("Excel files", "*.xlsx")]
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")]
         )
         if file_path:
             success, message = self.drl_config.import_from_excel(file_path)
             if success:
-                self.load_protocols()
                 messagebox.showinfo("Success", message)
             else:
                 messagebox.showerror("Error", message)
@@ -139,7 +164,7 @@ class DRLConfigWindow:
     def export_excel(self):
         file_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx")]
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")]
         )
         if file_path:
             success, message = self.drl_config.export_to_excel(file_path)
@@ -157,7 +182,6 @@ class DRLConfigWindow:
             protocol = self.protocol_list.get(selection[0])
             if messagebox.askyesno("Confirm Delete", f"Delete protocol {protocol}?"):
                 self.drl_config.delete_protocol(protocol)
-                self.load_protocols()
                 self.clear_form()
                 
     def clear_form(self):
@@ -0,0 +1,117 @@
+# failure_cache.py
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+
+from dicom_sources import split_source
+
+FAILURE_CACHE_FILE = "failed_files.json"
+# Errors that can go away without the file changing (stalled network mount,
+# worker killed by the system). Files failing with them are retried.
+TRANSIENT_ERRORS = {'TimeoutError', 'WorkerCrash', 'OSError', 'PermissionError', 'ConnectionError',
+                    'ConnectionResetError', 'BrokenPipeError', 'InterruptedError', 'BlockingIOError'}
+# Consecutive transient failures before a file is skipped, and for how long
+MAX_TRANSIENT_ATTEMPTS = 3
+RETRY_AFTER = timedelta(days=7)
+
+
+class FailureCache:
+    """Persistent list of files that could not be read (negative cache).
+
+    For every failed source the size and modification time of the file (of the
+    archive for archive members) and the error are stored. Files with read
+    errors (e.g. InvalidDicomError) are skipped on later runs until their size
+    or modification time changes. Files failing with a transient error are
+    retried; only after MAX_TRANSIENT_ATTEMPTS failures in a row are they
+    skipped, and then for RETRY_AFTER at most.
+    """
+
+    def __init__(self, file_path=FAILURE_CACHE_FILE):
+        self.file_path = file_path
+        self.failures = {}
+        self.skipped = 0
+        self.new = 0
+        self.load()
+
+    def __len__(self):
+        return len(self.failures)
+
+    def load(self):
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                self.failures = json.load(f)
+        except FileNotFoundError:
+            self.failures = {}
+
+    def save(self):
+        temp_path = self.file_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.failures, f, indent=4, ensure_ascii=False)
+        os.replace(temp_path, self.file_path)
+
+    @staticmethod
+    def file_state(source):
+        stat = os.stat(split_source(source)[0])
+        return stat.st_size, stat.st_mtime
+
+    def is_known_bad(self, source):
+        entry = self.failures.get(source)
+        if entry is None:
+            return False
+        try:
+            size, mtime = self.file_state(source)
+        except OSError:
+            size, mtime = None, None
+        if (size, mtime) != (entry['size'], entry['mtime']):
+            # The file has changed (or is gone), give it another chance
+            del self.failures[source]
+            return False
+        if entry['error'] in TRANSIENT_ERRORS:
+            last_seen = datetime.fromisoformat(entry['last_seen'])
+            if (entry.get('attempts', 1) < MAX_TRANSIENT_ATTEMPTS or
+                    datetime.now() - last_seen >= RETRY_AFTER):
+                return False
+        self.skipped += 1
+        return True
+
+    def record(self, source, error_class, message):
+        try:
+            size, mtime = self.file_state(source)
+        except OSError:
+            size, mtime = None, None
+        now = datetime.now().isoformat(timespec='seconds')
+        previous = self.failures.get(source, {})
+        self.failures[source] = {
+            'size': size,
+            'mtime': mtime,
+            'error': error_class,
+            'message': message,
+            'first_seen': previous.get('first_seen', now),
+            'last_seen': now,
+            'attempts': previous.get('attempts', 0) + 1
+        }
+        self.new += 1
+
+    def clear(self, source):
+        """Forget a file that has now been read successfully"""
+        self.failures.pop(source, None)
+
+    def filter(self, files):
+        """Drop known bad files from (source, file) pairs"""
+        for source, file in files:
+            if not self.is_known_bad(source):
+                yield source, file
+
+    def write_report(self, file_path):
+        """Quarantine report: one CSV row per known bad file"""
+        with open(file_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['File', 'Size', 'Modified', 'Error', 'Message', 'First Seen', 'Last Seen',
+                             'Attempts'])
+            for source, entry in sorted(self.failures.items()):
+                modified = (datetime.fromtimestamp(entry['mtime']).isoformat(timespec='seconds')
+                            if entry['mtime'] is not None else '')
+                writer.writerow([source, entry['size'], modified, entry['error'],
+                                 entry['message'], entry['first_seen'], entry['last_seen'],
+                                 entry.get('attempts', 1)])
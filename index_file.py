@@ -0,0 +1,38 @@
+# index_file.py
+import os
+import pickle
+
+
+def save_index(file_path, version, data):
+    """Pickle data (a dict) with its format version to file_path"""
+    # Written to a temporary file first, so a crash never leaves a truncated index
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump({'version': version, **data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, file_path)
+
+
+def load_index(file_path, version):
+    """(data, error) of an index file written by save_index.
+
+    data is None if there is no file. A file that cannot be read (truncated,
+    or pickled by an incompatible pandas) or has another format version is
+    renamed to <file>.bad and error describes why, so the caller starts a new
+    index instead of failing every run.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            data = pickle.load(f)
+        if not isinstance(data, dict) or data.get('version') != version:
+            raise ValueError(f"not a version {version} index file")
+        return data, None
+    except FileNotFoundError:
+        return None, None
+    except Exception as e:
+        bad_path = file_path + '.bad'
+        try:
+            os.replace(file_path, bad_path)
+        except OSError:
+            pass
+        return None, (f"{file_path} could not be read ({type(e).__name__}: {e}); "
+                      f"it was moved to {bad_path} and a new index is started")
@@ -0,0 +1,163 @@
+# isolated_reader.py
+import io
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+# Seconds a single file may take before its worker is killed
+FILE_TIMEOUT = 30
+# Sent by a worker once it has started and imported the modules of func
+READY = 'ready'
+
+
+def _worker(conn, func):
+    conn.send(READY)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        number, source, file = task
+        try:
+            if isinstance(file, bytes):
+                file = io.BytesIO(file)
+            elif hasattr(file, 'open'):
+                file = file.open()
+            conn.send((number, source, func(source, file), None))
+        except Exception as e:
+            conn.send((number, source, None, (type(e).__name__, str(e))))
+
+
+class IsolatedReader:
+    """Calls func(source, file) for every file in worker processes.
+
+    Every file gets a time budget of `timeout` seconds, counted from when its
+    worker is ready, so starting a replacement worker does not count. A worker
+    that exceeds it (e.g. a read hanging on a stalled network mount) is killed
+    and replaced, and the file is reported as failed with 'TimeoutError', so
+    one bad file cannot block the run. Exceptions raised by func are reported
+    the same way instead of being raised.
+    """
+
+    def __init__(self, func, timeout=FILE_TIMEOUT, workers=None):
+        self.func = func
+        self.timeout = timeout
+        self.worker_count = workers or min(4, os.cpu_count() or 1)
+        # spawn works the same on all platforms and is safe with Tk and threads
+        self.context = multiprocessing.get_context('spawn')
+        self.idle = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start_worker(self):
+        conn, child_conn = self.context.Pipe()
+        process = self.context.Process(target=_worker, args=(child_conn, self.func), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, conn
+
+    def _stop_worker(self, worker, kill=False):
+        process, conn = worker
+        if kill:
+            process.kill()
+        else:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        process.join(1)
+        if process.is_alive():
+            process.kill()
+        conn.close()
+
+    def imap(self, files):
+        """Yield (source, result, error) for (source, file) pairs in input order.
+
+        file is a path, a file object / bytes for archive members or an object
+        with an open() method returning a file object, called in the worker
+        (e.g. dicom_sources.ZipMember). It can also be an exception raised
+        getting the file, which is reported as the error of source without
+        reading anything. error is None on success or (error class name, message).
+        """
+        files = iter(files)
+        busy = {}        # conn -> (worker, number, source, deadline or None until ready)
+        finished = {}    # number -> result tuple, waiting for earlier files
+        next_number = 0
+        submitted = 0
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and (self.idle or len(busy) < self.worker_count):
+                    try:
+                        source, file = next(files)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if isinstance(file, Exception):
+                        # Getting the file already failed (e.g. a corrupt archive)
+                        finished[submitted] = (source, None, (type(file).__name__, str(file)))
+                        submitted += 1
+                        continue
+                    if hasattr(file, 'getvalue'):
+                        file = file.getvalue()
+                    if self.idle:
+                        worker = self.idle.pop()
+                        deadline = time.monotonic() + self.timeout
+                    else:
+                        worker = self._start_worker()
+                        deadline = None
+                    worker[1].send((submitted, source, file))
+                    busy[worker[1]] = (worker, submitted, source, deadline)
+                    submitted += 1
+
+                while next_number in finished:
+                    yield finished.pop(next_number)
+                    next_number += 1
+
+                if not busy:
+                    if exhausted:
+                        return
+                    continue
+
+                deadlines = [deadline for _, _, _, deadline in busy.values() if deadline is not None]
+                timeout = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+                for conn in wait(list(busy), timeout):
+                    worker, number, source, _ = busy.pop(conn)
+                    try:
+                        message = conn.recv()
+                    except (EOFError, OSError):
+                        # The worker died (e.g. crashed in a C extension)
+                        self._stop_worker(worker, kill=True)
+                        finished[number] = (source, None, ('WorkerCrash', "worker process exited"))
+                        continue
+                    if message == READY:
+                        # A new worker has started; the time budget of its file starts now
+                        busy[conn] = (worker, number, source, time.monotonic() + self.timeout)
+                        continue
+                    number, source, result, error = message
+                    self.idle.append(worker)
+                    finished[number] = (source, result, error)
+
+                now = time.monotonic()
+                for conn, (worker, number, source, deadline) in list(busy.items()):
+                    if deadline is not None and deadline <= now:
+                        del busy[conn]
+                        self._stop_worker(worker, kill=True)
+                        finished[number] = (source, None,
+                                            ('TimeoutError', f"no result within {self.timeout} s"))
+        finally:
+            # Files still being read when the caller stops iterating
+            for worker, _, _, _ in busy.values():
+                self._stop_worker(worker, kill=True)
+
+    def close(self):
+        while self.idle:
+            self._stop_worker(self.idle.pop())
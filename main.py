@@ -1,27 +1,46 @@
 # main.py
 import os
-import pydicom
-import pandas as pd
+import importlib
+import multiprocessing
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from datetime import datetime, date
+from datetime import datetime
 import warnings
 from tkcalendar import DateEntry
-from xhtml2pdf import pisa
-from jinja2 import Template
-from drl_config import DRLConfiguration
+from drl_config import shared_config
 from drl_config_window import DRLConfigWindow
 
+# pandas, pydicom and xhtml2pdf (with ReportLab) take seconds to import, so the
+# modules using them are imported by the methods that need them. Once the
+# window is shown they are preloaded in the background.
+PRELOAD_MODULES = ['dicom_sources', 'dose_records', 'dose_summary', 'spill_store',
+                   'failure_cache', 'dose_cube', 'batch_reports', 'pdf_report', 'progressive',
+                   'progressive_window', 'patient_index', 'patient_window', 'jinja2', 'xhtml2pdf.pisa']
+
+# Batch report choices in the GUI and the partitioning they use
+BATCH_MODES = {
+    "Off": None,
+    "Per Scanner": 'device',
+    "Per Month": 'month',
+    "Per Scanner and Month": 'device_month'
+}
+
 warnings.filterwarnings('ignore', category=UserWarning)
 
 class DICOMSRReaderApp:
     def __init__(self, root):
         self.root = root
         self.root.title("CT DICOM SR Dose Data Reader")
-        self.root.geometry("800x400")
-        self.drl_config = DRLConfiguration()
+        self.root.geometry("800x600")
+        self.drl_config = shared_config()
+        self.drl_config.subscribe(self.drl_config_changed)
+        self.dose_cube = None
+        self.patient_index = None
         self.create_variables()
         self.setup_gui()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        threading.Thread(target=preload_modules, daemon=True).start()
         
     def setup_gui(self):
         main_frame = tk.Frame(self.root)
@@ -37,7 +56,7 @@ class DICOMSRReaderApp:
         content_frame.pack(fill=tk.BOTH, expand=True)
         
         tk.Label(content_frame, 
-                text="Select Directory with DICOM SR Files",
+                text="Select Directory or Archive (ZIP/TAR) with DICOM SR Files",
                 font=("Helvetica", 10)).pack(pady=10)
         
         browse_btn = tk.Button(content_frame, 
@@ -47,6 +66,13 @@ class DICOMSRReaderApp:
                              relief=tk.GROOVE)
         browse_btn.pack()
         
+        archive_btn = tk.Button(content_frame, 
+                              text="Browse Archive", 
+                              command=self.select_archive,
+                              width=20,
+                              relief=tk.GROOVE)
+        archive_btn.pack(pady=5)
+        
         tk.Label(content_frame, 
                 textvariable=self.path_var, 
                 wraplength=600).pack(pady=5)
@@ -89,6 +115,16 @@ class DICOMSRReaderApp:
                       variable=self.scan_subdirs,
                       font=("Helvetica", 10)).pack(pady=5)
         
+        batch_frame = tk.Frame(content_frame)
+        batch_frame.pack(pady=5)
+        
+        tk.Label(batch_frame, text="Batch Reports:", font=("Helvetica", 10)).pack(side=tk.LEFT, padx=5)
+        ttk.Combobox(batch_frame, 
+                    textvariable=self.batch_mode,
+                    values=list(BATCH_MODES),
+                    state="readonly",
+                    width=22).pack(side=tk.LEFT, padx=2)
+        
         self.process_btn = tk.Button(content_frame, 
                                    text="Process Files", 
                                    command=self.process_files,
@@ -97,6 +133,35 @@ class DICOMSRReaderApp:
                                    relief=tk.GROOVE)
         self.process_btn.pack(pady=10)
         
+        self.preview_btn = tk.Button(content_frame, 
+                                   text="Progressive Preview", 
+                                   command=self.progressive_preview,
+                                   state=tk.DISABLED,
+                                   width=20,
+                                   relief=tk.GROOVE)
+        self.preview_btn.pack(pady=5)
+        
+        cube_btn = tk.Button(content_frame, 
+                           text="Report from Cube", 
+                           command=self.cube_report,
+                           width=20,
+                           relief=tk.GROOVE)
+        cube_btn.pack(pady=5)
+        
+        patient_btn = tk.Button(content_frame, 
+                              text="Patient Dose", 
+                              command=self.open_patient_dose,
+                              width=20,
+                              relief=tk.GROOVE)
+        patient_btn.pack(pady=5)
+        
+        quarantine_btn = tk.Button(content_frame, 
+                                 text="Quarantine Report", 
+                                 command=self.quarantine_report,
+                                 width=20,
+                                 relief=tk.GROOVE)
+        quarantine_btn.pack(pady=5)
+        
         tk.Label(content_frame, 
                 textvariable=self.status_var,
                 font=("Helvetica", 10)).pack(pady=5)
@@ -105,9 +170,10 @@ class DICOMSRReaderApp:
         self.path_var = tk.StringVar()
         self.status_var = tk.StringVar()
         self.scan_subdirs = tk.BooleanVar(value=True)
+        self.batch_mode = tk.StringVar(value="Off")
 
-    def find_dicom_files(self, directory):
-        dicom_files = []
+    def get_date_range(self):
+        """Selected (date_from, date_to); None where no date is selected"""
         try:
             if self.date_from.get():
                 date_from = datetime.strptime(self.date_from.get(), '%d.%m.%Y').date()
@@ -120,57 +186,120 @@ class DICOMSRReaderApp:
                 date_to = None
         except (ValueError, TypeError):
             messagebox.showerror("Error", "Invalid date selection")
+            return None
+        return date_from, date_to
+
+    def find_dicom_files(self, directory, failures=None):
+        import dicom_sources
+        
+        date_range = self.get_date_range()
+        if date_range is None:
             return []
             
-        if self.scan_subdirs.get():
-            for root, _, files in os.walk(directory):
-                for file in files:
-                    if file.endswith(('.dcm', '.DCM')):
-                        file_path = os.path.join(root, file)
-                        try:
-                            dcm = pydicom.dcmread(file_path)
-                            study_date = dcm.get('StudyDate', '')
-                            if study_date:
-                                file_date = datetime.strptime(study_date, '%Y%m%d').date()
-                                if ((not date_from or file_date >= date_from) and 
-                                    (not date_to or file_date <= date_to)):
-                                    dicom_files.append(file_path)
-                        except:
-                            continue
-        else:
-            for file in os.listdir(directory):
-                if file.endswith(('.dcm', '.DCM')):
-                    file_path = os.path.join(directory, file)
-                    try:
-                        dcm = pydicom.dcmread(file_path)
-                        study_date = dcm.get('StudyDate', '')
-                        if study_date:
-                            file_date = datetime.strptime(study_date, '%Y%m%d').date()
-                            if ((not date_from or file_date >= date_from) and 
-                                (not date_to or file_date <= date_to)):
-                                dicom_files.append(file_path)
-                    except:
-                        continue
-        return dicom_files
+        return dicom_sources.find_dicom_files(directory, self.scan_subdirs.get(), *date_range,
+                                              failures=failures)
 
     def process_files(self):
+        import dicom_sources
+        import dose_records
+        from failure_cache import FailureCache
+        from spill_store import SpillStore
+        
+        # Unreadable files are remembered and skipped on later runs
+        failures = FailureCache()
         directory = self.path_var.get()
-        dicom_files = self.find_dicom_files(directory)
+        try:
+            dicom_files = self.find_dicom_files(directory, failures)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to read files: {e}")
+            return
         
         if not dicom_files:
+            failures.save()
             messagebox.showerror("Error", "No DICOM files found")
             return
         
-        results = []
-        for file_path in dicom_files:
-            data = self.extract_patient_dose_data(file_path)
-            if data:
-                results.append(data)
+        # Records are spilled to a temporary file in chunks, so memory use
+        # depends on the chunk size and not on the number of files
+        with SpillStore() as results:
+            try:
+                dose_records.extract_records(dicom_sources.iter_source_files(dicom_files),
+                                             results, failures)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to read files: {e}")
+                return
+            failures.save()
+            
+            if not len(results):
+                messagebox.showerror("Error", "No valid DICOM SR files found")
+                return
+            
+            self.update_indexes(results)
+            if BATCH_MODES[self.batch_mode.get()]:
+                self.save_batch_reports(results)
+            else:
+                self.save_reports(results)
+        
+        if failures.new or failures.skipped:
+            self.status_var.set(f"{self.status_var.get()} ({failures.new} unreadable, "
+                                f"{failures.skipped} known bad files skipped)")
+
+    def progressive_preview(self):
+        """DRL comparison from a random sample first, refined until all files are read"""
+        from progressive_window import ProgressiveWindow
         
-        if not results:
-            messagebox.showerror("Error", "No valid DICOM SR files found")
+        date_range = self.get_date_range()
+        if date_range is None:
             return
+        
+        ProgressiveWindow(self.root, self.path_var.get(), self.scan_subdirs.get(), date_range,
+                          self.drl_config, self.preview_finished, self.save_reports)
+
+    def preview_finished(self, results, failures):
+        if len(results):
+            self.update_indexes(results)
+        self.status_var.set(f"Previewed {len(results)} files ({failures.new} unreadable, "
+                            f"{failures.skipped} known bad files skipped)")
+
+    def get_dose_cube(self):
+        if self.dose_cube is None:
+            from dose_cube import DoseCube
+            self.dose_cube = DoseCube()
+            if self.dose_cube.load_error:
+                messagebox.showwarning("Dose Cube", self.dose_cube.load_error)
+        return self.dose_cube
+
+    def get_patient_index(self):
+        if self.patient_index is None:
+            from patient_index import PatientIndex
+            self.patient_index = PatientIndex()
+            if self.patient_index.load_error:
+                messagebox.showwarning("Patient Index", self.patient_index.load_error)
+        return self.patient_index
+
+    def update_indexes(self, results):
+        """Add the extracted records to the dose cube and the patient index.
 
+        A failure here is shown but does not stop the reports from being saved.
+        """
+        try:
+            dose_cube = self.get_dose_cube()
+            patient_index = self.get_patient_index()
+            for chunk in results.iter_chunks():
+                dose_cube.add(chunk, self.drl_config)
+                patient_index.add(chunk)
+            dose_cube.save()
+            patient_index.save()
+        except Exception as e:
+            # Reloaded from the files the next time, without the partial update
+            self.dose_cube = None
+            self.patient_index = None
+            messagebox.showerror("Error", f"Failed to update the dose cube and patient index: {e}")
+
+    def save_reports(self, results):
+        import dose_summary
+        from spill_store import write_excel
+        
         # Generate filename based on date range
         filename_base = "DICOM_SR_Report"
         if self.date_from.get() and self.date_to.get():
@@ -188,13 +317,13 @@ class DICOMSRReaderApp:
         
         if excel_path:
             try:
-                df = pd.DataFrame(results)
-                df['Modality'] = df['Modality'].replace('SR', 'CT')
-                df.to_excel(excel_path, index=False)
+                write_excel(results.iter_chunks(), excel_path)
                 
                 # Generate PDF with same name but .pdf extension
                 pdf_path = os.path.splitext(excel_path)[0] + ".pdf"
-                self.generate_pdf_report(df, pdf_path)
+                summary = dose_summary.combine(
+                    dose_summary.summarize(chunk) for chunk in results.iter_chunks())
+                self.generate_pdf_report(summary, pdf_path)
                 
                 self.status_var.set(f"Processed {len(results)} files")
                 messagebox.showinfo("Success", 
@@ -202,8 +331,102 @@ class DICOMSRReaderApp:
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save files: {e}")
 
+    def save_batch_reports(self, results):
+        import pdf_report
+        from batch_reports import generate_batch_reports
+        
+        output_dir = filedialog.askdirectory(title="Select Folder for Batch Reports")
+        if not output_dir:
+            return
+        
+        try:
+            date_range = pdf_report.format_date_range(self.date_from.get(), self.date_to.get())
+            index = generate_batch_reports(results.iter_chunks(), output_dir,
+                                           BATCH_MODES[self.batch_mode.get()], date_range)
+            self.status_var.set(f"Processed {len(results)} files into {len(index)} reports")
+            messagebox.showinfo("Success", 
+                f"Processed {len(results)} files\nSaved {len(index)} reports to:\n{output_dir}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save files: {e}")
+
+    def cube_report(self):
+        """PDF report for the selected date range from the dose cube, without reading any files"""
+        dose_cube = self.get_dose_cube()
+        if not len(dose_cube):
+            messagebox.showerror("Error", "Dose cube is empty, process files first")
+            return
+        
+        date_range = self.get_date_range()
+        if date_range is None:
+            return
+        
+        dose_cube.rematch(self.drl_config)
+        summary = dose_cube.query(date_from=date_range[0], date_to=date_range[1])
+        if not len(summary):
+            messagebox.showerror("Error", "No data in dose cube for the selected period")
+            return
+        
+        pdf_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            initialfile="DICOM_SR_Cube_Report.pdf",
+            filetypes=[("PDF files", "*.pdf")]
+        )
+        
+        if pdf_path:
+            try:
+                self.generate_pdf_report(summary, pdf_path)
+                self.status_var.set(f"Report from {int(summary['count'].sum())} records in dose cube")
+                messagebox.showinfo("Success", f"Saved to:\n{pdf_path}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save report: {e}")
+
+    def quarantine_report(self):
+        from failure_cache import FailureCache
+        
+        failures = FailureCache()
+        if not len(failures):
+            messagebox.showinfo("Quarantine Report", "No unreadable files recorded")
+            return
+        
+        report_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            initialfile="DICOM_SR_Quarantine.csv",
+            filetypes=[("CSV files", "*.csv")]
+        )
+        
+        if report_path:
+            try:
+                failures.write_report(report_path)
+                messagebox.showinfo("Success", 
+                    f"{len(failures)} unreadable files\nSaved to:\n{report_path}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save report: {e}")
+
+    def open_patient_dose(self):
+        from patient_window import PatientDoseWindow
+        
+        patient_index = self.get_patient_index()
+        if not len(patient_index):
+            messagebox.showerror("Error", "Patient index is empty, process files first")
+            return
+        PatientDoseWindow(self.root, patient_index)
+
     def open_drl_config(self):
-        DRLConfigWindow(self.root)
+        DRLConfigWindow(self.root, self.drl_config)
+
+    def drl_config_changed(self, drl_config):
+        # The DRL comparison reads self.drl_config directly; only the cube keeps matches
+        if self.dose_cube is not None:
+            self.dose_cube.rematch(drl_config)
+        self.status_var.set("DRL configuration updated")
+
+    def close(self):
+        # DRL changes not written yet by the configuration window
+        try:
+            self.drl_config.flush()
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save DRL configuration: {e}")
+        self.root.destroy()
 
     def clear_dates(self):
         self.date_from.set_date(None)
@@ -214,357 +437,41 @@ class DICOMSRReaderApp:
         if directory:
             self.path_var.set(directory)
             self.process_btn['state'] = tk.NORMAL
+            self.preview_btn['state'] = tk.NORMAL
             self.status_var.set("Ready to process")
 
-    def process_content_sequence(self, sequence, patient_data):
-        if not sequence:
-            return
-            
-        for content_item in sequence:
-            if hasattr(content_item, 'ConceptNameCodeSequence'):
-                concept_name = content_item.ConceptNameCodeSequence[0].CodeMeaning
-                
-                if 'Acquisition Protocol' in concept_name and hasattr(content_item, 'TextValue'):
-                    patient_data['AcquisitionProtocol'] = str(content_item.TextValue)
-                elif 'Mean CTDIvol' in concept_name and hasattr(content_item, 'MeasuredValueSequence'):
-                    try:
-                        patient_data['CTDIvol'] = float(content_item.MeasuredValueSequence[0].NumericValue)
-                    except:
-                        pass
-                elif 'DLP' in concept_name and hasattr(content_item, 'MeasuredValueSequence'):
-                    try:
-                        patient_data['TotalDLP'] = float(content_item.MeasuredValueSequence[0].NumericValue)
-                    except:
-                        pass
-                        
-            if hasattr(content_item, 'ContentSequence'):
-                self.process_content_sequence(content_item.ContentSequence, patient_data)
-
-    def extract_patient_dose_data(self, file_path):
-        try:
-            dcm = pydicom.dcmread(file_path)
-            
-            if dcm.get('Modality', '') != 'SR':
-                return None
-                
-            patient_data = {
-                'File': os.path.basename(file_path),
-                'Modality': dcm.get('Modality', ''),
-                'Manufacturer': dcm.get('Manufacturer', ''),
-                'DeviceObserverModelName': dcm.get('DeviceObserverModelName', ''),
-                'PatientName': str(dcm.get('PatientName', '')),
-                'PatientID': dcm.get('PatientID', ''),
-                'PatientSex': dcm.get('PatientSex', ''),
-                'PatientBirthDate': dcm.get('PatientBirthDate', ''),
-                'PatientAge': dcm.get('PatientAge', ''),
-                'PatientWeight': dcm.get('PatientWeight', None),
-                'StudyDate': dcm.get('StudyDate', ''),
-                'StudyDescription': dcm.get('StudyDescription', ''),
-                'AcquisitionProtocol': '',
-                'TotalDLP': None,
-                'CTDIvol': None
-            }
-            
-            if patient_data['PatientBirthDate']:
-                birth_date = datetime.strptime(patient_data['PatientBirthDate'], '%Y%m%d').date()
-                study_date = datetime.strptime(dcm.get('StudyDate', date.today().strftime('%Y%m%d')), '%Y%m%d').date()
-                patient_data['CalculatedAge'] = (study_date - birth_date).days // 365
+    def select_archive(self):
+        archive = filedialog.askopenfilename(
+            filetypes=[("Archives", "*.zip *.tar *.tar.gz *.tgz *.tar.bz2 *.tbz2 *.tar.xz *.txz"),
+                       ("All files", "*.*")]
+        )
+        if archive:
+            self.path_var.set(archive)
+            self.process_btn['state'] = tk.NORMAL
+            self.preview_btn['state'] = tk.NORMAL
+            self.status_var.set("Ready to process")
 
-            if hasattr(dcm, 'ContentSequence'):
-                self.process_content_sequence(dcm.ContentSequence, patient_data)
+    def calculate_drl_comparison(self, summary):
+        """Calculate DRL comparison data for the report"""
+        import dose_summary
+        return dose_summary.drl_comparison(summary, self.drl_config)
 
-            return patient_data
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-            return None
+    def generate_pdf_report(self, summary, save_path):
+        import pdf_report
+        date_range = pdf_report.format_date_range(self.date_from.get(), self.date_to.get())
+        pdf_report.generate_pdf_report(summary, save_path, self.drl_config, date_range)
 
-    def calculate_drl_comparison(self, df):
-        """Calculate DRL comparison data for the report"""
-        comparison_data = []
-        
-        # Group data by protocol and calculate mean values
-        grouped_stats = df.groupby('AcquisitionProtocol').agg({
-            'TotalDLP': 'mean',
-            'CTDIvol': 'mean',
-            'DeviceObserverModelName': 'first'
-        }).round(2)
-        
-        for protocol, stats in grouped_stats.iterrows():
-            # Find matching DRL protocol
-            drl_protocol, drl_data = self.drl_config.get_matching_protocol(protocol)
-            
-            # Only include protocols that have matching DRL values
-            if drl_data and any(pattern.lower() in protocol.lower() 
-                               for pattern in drl_data['protocol_match']):
-                # Get appropriate DRL value
-                child_records = df[df['CalculatedAge'] <= 18]
-                if len(child_records) > 0:
-                    # For children, find appropriate age range
-                    for age_range, values in drl_data['child'].items():
-                        min_age, max_age = map(int, age_range.split('-'))
-                        age_records = child_records[
-                            (child_records['CalculatedAge'] >= min_age) & 
-                            (child_records['CalculatedAge'] <= max_age)
-                        ]
-                        if len(age_records) > 0:
-                            drl_level = values['DLP']
-                            break
-                    else:
-                        drl_level = drl_data['adult']['DLP']
-                else:
-                    drl_level = drl_data['adult']['DLP']
-                
-                # Calculate percentage and determine status
-                percentage = (stats['TotalDLP'] / drl_level) * 100
-                relative_percentage = percentage - 100  # Novirze no 100%
-                
-                if percentage <= 85:
-                    status = "Optimals"
-                    color = "#90EE90"  # Light green
-                elif percentage <= 100:
-                    status = "Pienemams"
-                    color = "#FFD700"  # Gold
-                else:
-                    status = "Parsniegts"
-                    color = "#FFB6C6"  # Light red
-                
-                comparison_data.append({
-                    'protocol': protocol,
-                    'device_model': stats['DeviceObserverModelName'],
-                    'avg_dlp': stats['TotalDLP'],
-                    'avg_ctdi': stats['CTDIvol'],
-                    'drl_level': drl_level,
-                    'percentage': relative_percentage,
-                    'status': status,
-                    'color': color
-                })
-        
-        return comparison_data
-
-    def generate_pdf_report(self, df, save_path):
-        # HTML template
-        html_template = """
-        <html>
-        <head>
-            <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
-            <style>
-                @page {
-                    size: a4 portrait;
-                    @frame header_frame {
-                        -pdf-frame-content: header_content;
-                        left: 50pt; width: 512pt; top: 30pt; height: 40pt;
-                    }
-                    @frame content_frame {
-                        left: 50pt; width: 512pt; top: 90pt; height: 632pt;
-                    }
-                }
-                body { 
-                    font-family: sans-serif;
-                    font-size: 10pt;
-                }
-                h1 { 
-                    text-align: center; 
-                    font-size: 16pt; 
-                    color: #000;
-                }
-                h2 { 
-                    font-size: 14pt; 
-                    color: #333; 
-                    margin-top: 20pt;
-                }
-                table { 
-                    width: 100%; 
-                    border-collapse: collapse; 
-                    margin: 10pt 0; 
-                }
-                th, td { 
-                    border: 1px solid #999; 
-                    padding: 6pt; 
-                    text-align: left;
-                    font-size: 10pt;
-                }
-                th { 
-                    background-color: #f0f0f0; 
-                }
-            </style>
-        </head>
-        <body>
-            <div id="header_content">
-                <h1>SIA Liepajas regionala slimnica</h1>
-                <h2 style="text-align: center;">DICOM SR Dose Data Report</h2>
-            </div>
-            
-            {% if date_range %}
-            <p>Periods: {{ date_range }}</p>
-            {% endif %}
-            
-            {% if drl_comparison %}
-            <h2>DRL Salidzinajums</h2>
-            <table>
-                <tr>
-                    <th>Protokols</th>
-                    <th>Videjais DLP</th>
-                    <th>Videjais CTDIvol</th>
-                    <th>DRL Limits</th>
-                    <th>Novirze no DRL</th>
-                    <th>Statuss</th>
-                </tr>
-                {% for row in drl_comparison %}
-                <tr style="background-color: {{ row.color }}">
-                    <td>{{ row.protocol }}</td>
-                    <td>{{ "%.2f"|format(row.avg_dlp) }}</td>
-                    <td>{{ "%.2f"|format(row.avg_ctdi) }}</td>
-                    <td>{{ "%.1f"|format(row.drl_level) }}</td>
-                    <td>{% if row.percentage >= 0 %}+{% endif %}{{ "%.1f"|format(row.percentage) }}%</td>
-                    <td>{{ row.status }}</td>
-                </tr>
-                {% endfor %}
-            </table>
-            {% endif %}
-            
-            {% if children_data %}
-            <h2>Kategorija: Berni (0-18 gadi)</h2>
-            <table>
-                <tr>
-                    <th>Protokols</th>
-                    <th>Vecums</th>
-                    <th>Videjais DLP</th>
-                    <th>Videjais CTDIvol</th>
-                    <th>Skaits</th>
-                </tr>
-                {% for row in children_data %}
-                <tr>
-                    <td>{{ row.protocol }}</td>
-                    <td>{{ row.age }} gadi</td>
-                    <td>{{ "%.2f"|format(row.dlp) }}</td>
-                    <td>{{ "%.2f"|format(row.ctdi) }}</td>
-                    <td>{{ row.count }}</td>
-                </tr>
-                {% endfor %}
-            </table>
-            {% endif %}
-            
-            {% for category in adult_categories %}
-            {% if category.data %}
-            <h2>Kategorija: Pieaugusie - {{ category.label }}</h2>
-            <table>
-                <tr>
-                    <th>Protokols</th>
-                    <th>Videjais DLP</th>
-                    <th>Videjais CTDIvol</th>
-                    <th>Skaits</th>
-                </tr>
-                {% for row in category.data %}
-                <tr>
-                    <td>{{ row.protocol }}</td>
-                    <td>{{ "%.2f"|format(row.dlp) }}</td>
-                    <td>{{ "%.2f"|format(row.ctdi) }}</td>
-                    <td>{{ row.count }}</td>
-                </tr>
-                {% endfor %}
-            </table>
-            {% endif %}
-            {% endfor %}
-        </body>
-        </html>
-        """
-        
-        # Prepare data for template
-        template_data = {
-            'date_range': '',
-            'children_data': [],
-            'adult_categories': [],
-            'drl_comparison': self.calculate_drl_comparison(df)
-        }
-        
-        # Date range
-        if self.date_from.get():
-            template_data['date_range'] = f"No: {self.date_from.get()}"
-        if self.date_to.get():
-            template_data['date_range'] += f" Lidz: {self.date_to.get()}"
-        
-        # Process children data
-        children_df = df[df['CalculatedAge'] <= 18]
-        if len(children_df) > 0:
-            # Labotā grupēšanas metode
-            children_stats = children_df.groupby(['AcquisitionProtocol', 'CalculatedAge']).agg({
-                'TotalDLP': 'mean',
-                'CTDIvol': 'mean'
-            }).reset_index()
-            
-            # Pievienojam skaitu atsevišķi
-            count_df = children_df.groupby(['AcquisitionProtocol', 'CalculatedAge']).size()
-            children_stats['count'] = count_df.values
-            
-            for _, row in children_stats.iterrows():
-                template_data['children_data'].append({
-                    'protocol': row['AcquisitionProtocol'],
-                    'age': row['CalculatedAge'],
-                    'dlp': row['TotalDLP'],
-                    'ctdi': row['CTDIvol'],
-                    'count': row['count']
-                })
-    
-        # Process adults by weight categories
-        adults_df = df[df['CalculatedAge'] > 18]
-        weight_ranges = [
-            (40, 50, "40kg - 50kg"),
-            (50, 60, "50kg - 60kg"),
-            (60, 70, "60kg - 70kg"),
-            (70, 80, "70kg - 80kg"),
-            (80, 90, "80kg - 90kg"),
-            (90, 100, "90kg - 100kg"),
-            (100, float('inf'), "Virs 100kg")
-        ]
-        
-        for weight_min, weight_max, weight_label in weight_ranges:
-            category_data = {
-                'label': weight_label,
-                'data': []
-            }
-            
-            if weight_max == float('inf'):
-                weight_df = adults_df[adults_df['PatientWeight'] >= weight_min]
-            else:
-                weight_df = adults_df[(adults_df['PatientWeight'] >= weight_min) & 
-                                    (adults_df['PatientWeight'] < weight_max)]
-            
-            if len(weight_df) > 0:
-                # Labotā grupēšanas metode
-                protocol_stats = weight_df.groupby(['AcquisitionProtocol', 'DeviceObserverModelName']).agg({
-                    'TotalDLP': 'mean',
-                    'CTDIvol': 'mean'
-                }).reset_index()
-                
-                # Pievienojam skaitu atsevišķi
-                count_df = weight_df.groupby(['AcquisitionProtocol', 'DeviceObserverModelName']).size()
-                protocol_stats['count'] = count_df.values
-                
-                for _, row in protocol_stats.iterrows():
-                    category_data['data'].append({
-                        'protocol': row['AcquisitionProtocol'],
-                        'device_model': row['DeviceObserverModelName'],
-                        'dlp': row['TotalDLP'],
-                        'ctdi': row['CTDIvol'],
-                        'count': row['count']
-                    })
-                    
-                template_data['adult_categories'].append(category_data)
-        
-        # Generate HTML
-        template = Template(html_template)
-        html_out = template.render(**template_data)
-        
-        # Convert to PDF
-        with open(save_path, "wb") as output_file:
-            pdf = pisa.pisaDocument(
-                src=html_out,
-                dest=output_file,
-                encoding='UTF-8'
-            )
+
+def preload_modules():
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
 
 
 def main():
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = DICOMSRReaderApp(root)
     root.mainloop()
@@ -0,0 +1,152 @@
+# patient_index.py
+import calendar
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+
+import numpy as np
+
+from dose_records import SOURCE_COLUMN
+from index_file import load_index, save_index
+from record_keys import RecordKeySet, record_keys
+
+PATIENT_INDEX_FILE = "patient_index.pkl"
+# Changed whenever the pickled layout changes; older files are set aside
+FORMAT_VERSION = 2
+# Default window of the cumulative dose
+WINDOW_MONTHS = 12
+# Studies without a StudyDate are kept first in the list and left out of windows
+NO_DATE = 0
+
+
+def months_before(day, months):
+    """Date `months` calendar months before day (clamped to the end of shorter months)"""
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    return date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+class PatientIndex:
+    """Time-ordered list of studies per PatientID, for cumulative dose lookups.
+
+    For every patient the studies are kept sorted by StudyDate as
+    (day ordinal, source, protocol, TotalDLP, CTDIvol) together with the
+    running total of TotalDLP, so the dose of any time window is two binary
+    searches and a subtraction. The index is updated from the extracted
+    records of every run; SRs already added (by SOPInstanceUID, also when
+    read from another path) are skipped.
+    """
+
+    def __init__(self, file_path=PATIENT_INDEX_FILE):
+        self.file_path = file_path
+        self.load()
+
+    def __len__(self):
+        return len(self.studies)
+
+    def load(self):
+        """Load the saved index; load_error tells why an unreadable file was replaced"""
+        data, self.load_error = load_index(self.file_path, FORMAT_VERSION)
+        if data is None:
+            self.studies = {}
+            self.cumulative = {}
+            self.keys = RecordKeySet()
+        else:
+            self.studies = data['studies']
+            self.cumulative = data['cumulative']
+            self.keys = data['keys']
+
+    def save(self):
+        save_index(self.file_path, FORMAT_VERSION, {'studies': self.studies,
+                                                    'cumulative': self.cumulative,
+                                                    'keys': self.keys})
+
+    def add(self, df):
+        """Add a chunk of extracted records; returns the number of new studies"""
+        df = df[df['PatientID'] != '']
+        keys = record_keys(df)
+        new = self.keys.new_mask(keys)
+        df = df[new]
+        if len(df) == 0:
+            return 0
+
+        study_dates = df['StudyDate']
+        days = np.where(study_dates.notna(),
+                        study_dates.values.astype('datetime64[D]').astype('int64')
+                        + date(1970, 1, 1).toordinal(),
+                        NO_DATE)
+        changed = set()
+        for patient_id, day, source, protocol, dlp, ctdi in zip(
+                df['PatientID'], days.tolist(), df[SOURCE_COLUMN],
+                df['AcquisitionProtocol'].astype(object), df['TotalDLP'].tolist(),
+                df['CTDIvol'].tolist()):
+            insort(self.studies.setdefault(patient_id, []), (day, source, protocol, dlp, ctdi))
+            changed.add(patient_id)
+
+        for patient_id in changed:
+            total = 0.0
+            running = []
+            for study in self.studies[patient_id]:
+                if study[3] == study[3]:  # NaN DLP adds nothing
+                    total += study[3]
+                running.append(total)
+            self.cumulative[patient_id] = running
+        self.keys.add(keys[new])
+        return len(df)
+
+    def _bounds(self, patient_id, date_from=None, date_to=None):
+        """Index range of the studies of a patient with date_from <= StudyDate <= date_to"""
+        studies = self.studies[patient_id]
+        first = bisect_left(studies, (date_from.toordinal(),) if date_from else (NO_DATE + 1,))
+        last = bisect_right(studies, (date_to.toordinal() + 1,)) if date_to else len(studies)
+        return first, max(first, last)
+
+    def patient_studies(self, patient_id, date_from=None, date_to=None):
+        """Studies of a patient in date order, as dicts (empty list for unknown patients)"""
+        if patient_id not in self.studies:
+            return []
+        studies = self.studies[patient_id]
+        if date_from or date_to:
+            first, last = self._bounds(patient_id, date_from, date_to)
+            studies = studies[first:last]
+        return [{
+            'StudyDate': date.fromordinal(day) if day != NO_DATE else None,
+            'AcquisitionProtocol': protocol,
+            'TotalDLP': dlp,
+            'CTDIvol': ctdi,
+            'Source': source
+        } for day, source, protocol, dlp, ctdi in studies]
+
+    def window(self, months=WINDOW_MONTHS, end=None):
+        """(date_from, date_to) of the last `months` months up to end (default today).
+
+        months=0 means all studies of the patient, including undated ones.
+        """
+        if not months:
+            return None, None
+        end = end or date.today()
+        return months_before(end, months), end
+
+    def cumulative_dlp(self, patient_id, months=WINDOW_MONTHS, end=None):
+        """(sum of TotalDLP, number of studies) of a patient in the window"""
+        if patient_id not in self.studies:
+            return 0.0, 0
+        running = self.cumulative[patient_id]
+        date_from, date_to = self.window(months, end)
+        if date_from is None:
+            return running[-1], len(running)
+        first, last = self._bounds(patient_id, date_from, date_to)
+        if first == last:
+            return 0.0, 0
+        return running[last - 1] - (running[first - 1] if first else 0.0), last - first
+
+    def above_threshold(self, threshold, months=WINDOW_MONTHS, end=None):
+        """Patients whose cumulative DLP in the window is at least threshold.
+
+        Returns (PatientID, cumulative DLP, number of studies) tuples, highest dose first.
+        """
+        patients = []
+        for patient_id in self.studies:
+            total, count = self.cumulative_dlp(patient_id, months, end)
+            if count and total >= threshold:
+                patients.append((patient_id, total, count))
+        patients.sort(key=lambda patient: patient[1], reverse=True)
+        return patients
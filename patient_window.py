@@ -0,0 +1,153 @@
+# patient_window.py
+import csv
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from datetime import datetime
+
+from patient_index import WINDOW_MONTHS
+
+
+class PatientDoseWindow:
+    """Cumulative CT dose per patient from the patient index"""
+
+    def __init__(self, parent, patient_index):
+        self.patient_index = patient_index
+        self.high_dose_patients = []
+        self.window = tk.Toplevel(parent)
+        self.window.title("Patient Cumulative Dose")
+        self.window.geometry("800x600")
+
+        main_frame = ttk.Frame(self.window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # Window of the cumulative dose
+        window_frame = ttk.Frame(main_frame)
+        window_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(window_frame, text="Months (0 = all):").pack(side=tk.LEFT, padx=2)
+        self.months = ttk.Entry(window_frame, width=6)
+        self.months.insert(0, str(WINDOW_MONTHS))
+        self.months.pack(side=tk.LEFT, padx=2)
+        ttk.Label(window_frame, text="Up to (dd.mm.yyyy, empty = today):").pack(side=tk.LEFT, padx=2)
+        self.end_date = ttk.Entry(window_frame, width=12)
+        self.end_date.pack(side=tk.LEFT, padx=2)
+
+        # Single patient
+        patient_frame = ttk.LabelFrame(main_frame, text="Patient", padding="5")
+        patient_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        search_frame = ttk.Frame(patient_frame)
+        search_frame.pack(fill=tk.X)
+        ttk.Label(search_frame, text="Patient ID:").pack(side=tk.LEFT, padx=2)
+        self.patient_id = ttk.Entry(search_frame, width=20)
+        self.patient_id.pack(side=tk.LEFT, padx=2)
+        self.patient_id.bind('<Return>', lambda event: self.lookup_patient())
+        ttk.Button(search_frame, text="Lookup", command=self.lookup_patient).pack(side=tk.LEFT, padx=2)
+
+        self.patient_total = tk.StringVar()
+        ttk.Label(patient_frame, textvariable=self.patient_total).pack(anchor=tk.W, pady=2)
+
+        self.studies_table = ttk.Treeview(patient_frame, columns=('date', 'protocol', 'dlp', 'ctdi'),
+                                          show='headings', height=8)
+        for name, heading in (('date', "Study Date"), ('protocol', "Protocol"),
+                              ('dlp', "Total DLP"), ('ctdi', "CTDIvol")):
+            self.studies_table.heading(name, text=heading)
+        self.studies_table.pack(fill=tk.BOTH, expand=True)
+
+        # Patients above a threshold
+        threshold_frame = ttk.LabelFrame(main_frame, text="High Cumulative Dose", padding="5")
+        threshold_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        search_frame = ttk.Frame(threshold_frame)
+        search_frame.pack(fill=tk.X)
+        ttk.Label(search_frame, text="DLP threshold (mGy*cm):").pack(side=tk.LEFT, padx=2)
+        self.threshold = ttk.Entry(search_frame, width=10)
+        self.threshold.pack(side=tk.LEFT, padx=2)
+        ttk.Button(search_frame, text="Find Patients", command=self.find_patients).pack(side=tk.LEFT, padx=2)
+        ttk.Button(search_frame, text="Export CSV", command=self.export_patients).pack(side=tk.LEFT, padx=2)
+
+        self.patients_table = ttk.Treeview(threshold_frame, columns=('patient', 'dlp', 'count'),
+                                           show='headings', height=8)
+        for name, heading in (('patient', "Patient ID"), ('dlp', "Cumulative DLP"),
+                              ('count', "Studies")):
+            self.patients_table.heading(name, text=heading)
+        self.patients_table.pack(fill=tk.BOTH, expand=True)
+        self.patients_table.bind('<Double-1>', self.on_patient_select)
+
+    def get_window(self):
+        """(months, end date) entered; None after showing an error"""
+        try:
+            months = int(self.months.get() or 0)
+            end = (datetime.strptime(self.end_date.get(), '%d.%m.%Y').date()
+                   if self.end_date.get() else None)
+        except ValueError:
+            messagebox.showerror("Error", "Invalid months or date", parent=self.window)
+            return None
+        return months, end
+
+    def lookup_patient(self):
+        window = self.get_window()
+        if window is None:
+            return
+
+        patient_id = self.patient_id.get().strip()
+        studies = self.patient_index.patient_studies(patient_id)
+        self.studies_table.delete(*self.studies_table.get_children())
+        if not studies:
+            self.patient_total.set(f"No studies found for patient {patient_id}")
+            return
+
+        for study in studies:
+            self.studies_table.insert('', tk.END, values=(
+                study['StudyDate'].strftime('%d.%m.%Y') if study['StudyDate'] else '',
+                study['AcquisitionProtocol'],
+                f"{study['TotalDLP']:.2f}",
+                f"{study['CTDIvol']:.2f}"
+            ))
+        total, count = self.patient_index.cumulative_dlp(patient_id, *window)
+        period = f"last {window[0]} months" if window[0] else "all studies"
+        self.patient_total.set(f"Cumulative DLP ({period}): {total:.2f} mGy*cm in {count} studies")
+
+    def find_patients(self):
+        window = self.get_window()
+        if window is None:
+            return
+        try:
+            threshold = float(self.threshold.get())
+        except ValueError:
+            messagebox.showerror("Error", "Invalid DLP threshold", parent=self.window)
+            return
+
+        self.high_dose_patients = self.patient_index.above_threshold(threshold, *window)
+        self.patients_table.delete(*self.patients_table.get_children())
+        for patient_id, total, count in self.high_dose_patients:
+            self.patients_table.insert('', tk.END, iid=patient_id,
+                                       values=(patient_id, f"{total:.2f}", count))
+
+    def on_patient_select(self, event):
+        selection = self.patients_table.selection()
+        if selection:
+            self.patient_id.delete(0, tk.END)
+            # The item id is the PatientID; values would turn IDs like '007' into numbers
+            self.patient_id.insert(0, selection[0])
+            self.lookup_patient()
+
+    def export_patients(self):
+        if not self.high_dose_patients:
+            messagebox.showerror("Error", "Find patients first", parent=self.window)
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            parent=self.window,
+            defaultextension=".csv",
+            initialfile="DICOM_SR_High_Dose_Patients.csv",
+            filetypes=[("CSV files", "*.csv")]
+        )
+        if file_path:
+            try:
+                with open(file_path, 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['PatientID', 'Cumulative DLP', 'Studies'])
+                    writer.writerows(self.high_dose_patients)
+                messagebox.showinfo("Success", f"Saved to:\n{file_path}", parent=self.window)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save file: {e}", parent=self.window)
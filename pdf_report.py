@@ -0,0 +1,171 @@
+# pdf_report.py
+import dose_summary
+
+HTML_TEMPLATE = """
+<html>
+<head>
+    <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
+    <style>
+        @page {
+            size: a4 portrait;
+            @frame header_frame {
+                -pdf-frame-content: header_content;
+                left: 50pt; width: 512pt; top: 30pt; height: 40pt;
+            }
+            @frame content_frame {
+                left: 50pt; width: 512pt; top: 90pt; height: 632pt;
+            }
+        }
+        body { 
+            font-family: sans-serif;
+            font-size: 10pt;
+        }
+        h1 { 
+            text-align: center; 
+            font-size: 16pt; 
+            color: #000;
+        }
+        h2 { 
+            font-size: 14pt; 
+            color: #333; 
+            margin-top: 20pt;
+        }
+        table { 
+            width: 100%; 
+            border-collapse: collapse; 
+            margin: 10pt 0; 
+        }
+        th, td { 
+            border: 1px solid #999; 
+            padding: 6pt; 
+            text-align: left;
+            font-size: 10pt;
+        }
+        th { 
+            background-color: #f0f0f0; 
+        }
+    </style>
+</head>
+<body>
+    <div id="header_content">
+        <h1>SIA Liepajas regionala slimnica</h1>
+        <h2 style="text-align: center;">DICOM SR Dose Data Report</h2>
+    </div>
+
+    {% if date_range %}
+    <p>Periods: {{ date_range }}</p>
+    {% endif %}
+
+    {% if device %}
+    <p>Iekarta: {{ device }}</p>
+    {% endif %}
+
+    {% if drl_comparison %}
+    <h2>DRL Salidzinajums</h2>
+    <table>
+        <tr>
+            <th>Protokols</th>
+            <th>Videjais DLP</th>
+            <th>Videjais CTDIvol</th>
+            <th>DRL Limits</th>
+            <th>Novirze no DRL</th>
+            <th>Statuss</th>
+        </tr>
+        {% for row in drl_comparison %}
+        <tr style="background-color: {{ row.color }}">
+            <td>{{ row.protocol }}</td>
+            <td>{{ "%.2f"|format(row.avg_dlp) }}</td>
+            <td>{{ "%.2f"|format(row.avg_ctdi) }}</td>
+            <td>{{ "%.1f"|format(row.drl_level) }}</td>
+            <td>{% if row.percentage >= 0 %}+{% endif %}{{ "%.1f"|format(row.percentage) }}%</td>
+            <td>{{ row.status }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+    {% endif %}
+
+    {% if children_data %}
+    <h2>Kategorija: Berni (0-18 gadi)</h2>
+    <table>
+        <tr>
+            <th>Protokols</th>
+            <th>Vecums</th>
+            <th>Videjais DLP</th>
+            <th>Videjais CTDIvol</th>
+            <th>Skaits</th>
+        </tr>
+        {% for row in children_data %}
+        <tr>
+            <td>{{ row.protocol }}</td>
+            <td>{{ row.age }} gadi</td>
+            <td>{{ "%.2f"|format(row.dlp) }}</td>
+            <td>{{ "%.2f"|format(row.ctdi) }}</td>
+            <td>{{ row.count }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+    {% endif %}
+
+    {% for category in adult_categories %}
+    {% if category.data %}
+    <h2>Kategorija: Pieaugusie - {{ category.label }}</h2>
+    <table>
+        <tr>
+            <th>Protokols</th>
+            <th>Videjais DLP</th>
+            <th>Videjais CTDIvol</th>
+            <th>Skaits</th>
+        </tr>
+        {% for row in category.data %}
+        <tr>
+            <td>{{ row.protocol }}</td>
+            <td>{{ "%.2f"|format(row.dlp) }}</td>
+            <td>{{ "%.2f"|format(row.ctdi) }}</td>
+            <td>{{ row.count }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+    {% endif %}
+    {% endfor %}
+</body>
+</html>
+"""
+
+
+def format_date_range(date_from, date_to):
+    """Period line of the report from 'dd.mm.yyyy' strings (empty if not set)"""
+    date_range = ''
+    if date_from:
+        date_range = f"No: {date_from}"
+    if date_to:
+        date_range += f" Lidz: {date_to}"
+    return date_range
+
+
+def generate_pdf_report(summary, save_path, drl_config, date_range='', device=''):
+    """Render the PDF report for a summary (see dose_summary.summarize)"""
+    # xhtml2pdf pulls in ReportLab and takes most of the startup time,
+    # so it is imported when the first report is rendered
+    from jinja2 import Template
+    from xhtml2pdf import pisa
+
+    # Prepare data for template
+    template_data = {
+        'date_range': date_range,
+        'device': device,
+        'children_data': dose_summary.children_data(summary),
+        'adult_categories': dose_summary.adult_categories(summary),
+        'drl_comparison': dose_summary.drl_comparison(summary, drl_config)
+    }
+
+    # Generate HTML
+    template = Template(HTML_TEMPLATE)
+    html_out = template.render(**template_data)
+
+    # Convert to PDF
+    with open(save_path, "wb") as output_file:
+        pisa.pisaDocument(
+            src=html_out,
+            dest=output_file,
+            encoding='UTF-8'
+        )
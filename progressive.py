@@ -0,0 +1,220 @@
+# progressive.py
+import math
+import os
+import random
+import zipfile
+
+import pandas as pd
+
+import dicom_sources
+import dose_summary
+from dose_records import DoseRecordBuilder, extract_patient_dose_data
+from isolated_reader import IsolatedReader, FILE_TIMEOUT
+
+# Files processed between two updates of the estimate
+BATCH_SIZE = 500
+# Two-sided 95% confidence level
+Z_95 = 1.96
+
+
+def format_ci(value, half_width, unit=''):
+    """'mean ± half width'; '?' when there is no valid interval"""
+    if half_width != half_width:  # NaN
+        return f"{value:.2f}{unit} ± ?"
+    return f"{value:.2f}{unit} ± {half_width:.2f}{unit}"
+
+
+def stratified_order(files, seed=None):
+    """Order files so that every prefix is a proportional stratified random sample.
+
+    Files are stratified by directory (exports are usually organised by date or
+    study). Inside a stratum the order is random, and the strata are interleaved
+    in proportion to their size.
+    """
+    rng = random.Random(seed)
+    strata = {}
+    for file_path in files:
+        strata.setdefault(os.path.dirname(file_path), []).append(file_path)
+
+    keyed = []
+    for stratum in strata.values():
+        rng.shuffle(stratum)
+        size = len(stratum)
+        for rank, file_path in enumerate(stratum):
+            keyed.append(((rank + rng.random()) / size, file_path))
+    keyed.sort()
+    return [file_path for _, file_path in keyed]
+
+
+class ProgressiveEstimate:
+    """DRL comparison means with confidence intervals, from the files read so far.
+
+    Intervals use the finite population correction, so they shrink to zero
+    when all files have been read and the result is exact. They are only
+    valid for a random sample: while tar archives (which can only be read in
+    order) are pending, the files read so far are not one, so no intervals
+    are given until everything has been read. total_files then grows as the
+    tar members are found.
+    """
+
+    def __init__(self, total_files, drl_config, date_from=None, date_to=None, pending_archives=0):
+        self.total_files = total_files
+        self.drl_config = drl_config
+        self.date_from = date_from
+        self.date_to = date_to
+        self.pending_archives = pending_archives
+        self.random_sample = pending_archives == 0
+        self.processed_files = 0
+        self.summary = dose_summary.empty_summary()
+        self.squares = pd.DataFrame(columns=['TotalDLP', 'CTDIvol'], dtype='float64')
+
+    @property
+    def fraction(self):
+        return self.processed_files / self.total_files if self.total_files else 1.0
+
+    @property
+    def exact(self):
+        return self.pending_archives == 0 and self.processed_files >= self.total_files
+
+    def describe(self):
+        """Progress line shown with the table"""
+        if self.pending_archives:
+            files = f"{self.total_files}+ files ({self.pending_archives} tar archives not read yet)"
+        else:
+            files = f"{self.total_files} files ({self.fraction:.1%})"
+        if self.exact:
+            state = "exact result"
+        elif self.random_sample:
+            state = "approximate, 95% confidence intervals"
+        else:
+            state = "approximate, no confidence intervals until the tar archives are read"
+        return f"Processed {self.processed_files} of {files} - {state}"
+
+    def filter_dates(self, df):
+        # Like find_dicom_files, files without a StudyDate are left out
+        df = df[df['StudyDate'].notna()]
+        if self.date_from:
+            df = df[df['StudyDate'] >= pd.Timestamp(self.date_from)]
+        if self.date_to:
+            df = df[df['StudyDate'] <= pd.Timestamp(self.date_to)]
+        return df
+
+    def update(self, df, processed_files):
+        """Add the records of a batch; processed_files counts all files read so far"""
+        self.processed_files = processed_files
+        df = self.filter_dates(df)
+        if not len(df):
+            return df
+        self.summary = dose_summary.combine([self.summary, dose_summary.summarize(df)])
+        squares = (df[dose_summary.MEASURES] ** 2).groupby(
+            df['AcquisitionProtocol'].astype(object)).sum()
+        self.squares = self.squares.add(squares, fill_value=0)
+        return df
+
+    def comparison(self, z=Z_95):
+        """calculate_drl_comparison rows with ±half widths of the confidence intervals"""
+        rows = dose_summary.drl_comparison(self.summary, self.drl_config)
+        stats = dose_summary.aggregate(self.summary, 'AcquisitionProtocol')
+        correction = math.sqrt(max(0.0, 1 - self.fraction))
+        for row in rows:
+            protocol_stats = stats.loc[row['protocol']]
+            row['count'] = int(protocol_stats['count'])
+            for measure, key in (('TotalDLP', 'dlp_ci'), ('CTDIvol', 'ctdi_ci')):
+                n = protocol_stats[f'{measure}_n']
+                mean = protocol_stats[measure]
+                if self.exact:
+                    row[key] = 0.0
+                elif n > 1 and self.random_sample:
+                    variance = (self.squares.loc[row['protocol'], measure] - n * mean ** 2) / (n - 1)
+                    row[key] = z * math.sqrt(max(0.0, variance) / n) * correction
+                else:
+                    row[key] = float('nan')
+            row['percentage_ci'] = row['dlp_ci'] / row['drl_level'] * 100
+        return rows
+
+
+def run_progressive(path, drl_config, callback, recursive=True, date_from=None, date_to=None,
+                    results=None, failures=None, batch_size=BATCH_SIZE, timeout=FILE_TIMEOUT,
+                    cancelled=None, seed=None):
+    """Read all files under path in stratified random order, reporting as it goes.
+
+    callback(estimate) is called after every batch_size files and at the end.
+    Plain files and ZIP members (which can be opened one by one) are read in
+    stratified random order. Tar archives can only be read sequentially, so
+    they are streamed after them without counting their members first. If
+    results (a SpillStore) is given, the records are stored there for the
+    full report. cancelled() is checked between files to stop early.
+    """
+    dicom_files, archives = dicom_sources.list_files(path, recursive)
+    zip_archives = [archive for archive in archives if zipfile.is_zipfile(archive)]
+    tar_archives = [archive for archive in archives if archive not in zip_archives]
+    sampled = list(dicom_files)
+    # ZIP archives whose member list cannot be read, as (archive, exception)
+    archive_errors = []
+    for archive in zip_archives:
+        try:
+            member_names = dicom_sources.zip_member_names(archive)
+        except Exception as e:
+            archive_errors.append((archive, e))
+            continue
+        sampled.extend(dicom_sources.member_source(archive, member_name)
+                       for member_name in member_names)
+
+    estimate = ProgressiveEstimate(len(sampled) + len(archive_errors), drl_config,
+                                   date_from, date_to, len(tar_archives))
+
+    def all_files():
+        # Unreadable archives are passed on as failures and the others still read
+        yield from archive_errors
+        for source in stratified_order(sampled, seed):
+            archive_path, member_name = dicom_sources.split_source(source)
+            if member_name is None:
+                yield source, source
+            else:
+                # Read by the worker, within the time budget of the file
+                yield source, dicom_sources.ZipMember(archive_path, member_name)
+        for archive in tar_archives:
+            for source, member in dicom_sources.iter_archive_sources(archive):
+                estimate.total_files += 1
+                yield source, member
+            estimate.pending_archives -= 1
+
+    sources = all_files()
+    if failures is not None:
+        sources = failures.filter(sources)
+
+    batch = DoseRecordBuilder()
+    processed = 0
+    reported_exact = False
+    with IsolatedReader(extract_patient_dose_data, timeout) as reader:
+        for source, record, error in reader.imap(sources):
+            processed += 1
+            if error:
+                if failures is not None:
+                    failures.record(source, *error)
+            else:
+                if failures is not None:
+                    failures.clear(source)
+                if record:
+                    batch.append(record)
+
+            if processed % batch_size == 0:
+                _flush_batch(estimate, batch, processed, results)
+                batch = DoseRecordBuilder()
+                callback(estimate)
+                reported_exact = estimate.exact
+            if cancelled is not None and cancelled():
+                return estimate
+
+    # Known bad files that were skipped count as processed
+    if processed % batch_size or not reported_exact:
+        _flush_batch(estimate, batch, estimate.total_files, results)
+        callback(estimate)
+    return estimate
+
+
+def _flush_batch(estimate, batch, processed, results):
+    df = estimate.update(batch.to_dataframe(), processed)
+    if results is not None:
+        for chunk_start in range(0, len(df), results.chunk_size):
+            results.append_chunk(df.iloc[chunk_start:chunk_start + results.chunk_size])
@@ -0,0 +1,155 @@
+# progressive_window.py
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+# Milliseconds between two checks for new estimates
+POLL_INTERVAL = 200
+
+COLUMNS = [
+    ('protocol', "Protocol", 200),
+    ('dlp', "Mean DLP", 130),
+    ('ctdi', "Mean CTDIvol", 120),
+    ('drl', "DRL", 70),
+    ('deviation', "Deviation", 130),
+    ('count', "N", 60)
+]
+
+
+class ProgressiveWindow:
+    """DRL comparison that starts from a random sample and is refined while files are read.
+
+    Files are read in a background thread; every estimate is passed to the
+    window through a queue. Closing the window stops the reading. When all
+    files are read the result is exact and the full report can be saved.
+    """
+
+    def __init__(self, parent, path, recursive, date_range, drl_config, on_finished, on_save):
+        from failure_cache import FailureCache
+        from spill_store import SpillStore
+
+        self.path = path
+        self.recursive = recursive
+        self.date_range = date_range
+        self.drl_config = drl_config
+        self.on_finished = on_finished
+        self.on_save = on_save
+        self.updates = queue.Queue()
+        self.cancelled = threading.Event()
+        self.failures = FailureCache()
+        self.results = SpillStore()
+        self.finished = False
+        self.closed = False
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Progressive Preview")
+        self.window.geometry("760x420")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ttk.Frame(self.window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.progress_var = tk.StringVar(value="Listing files...")
+        ttk.Label(main_frame, textvariable=self.progress_var).pack(anchor=tk.W, pady=2)
+        self.progress = ttk.Progressbar(main_frame, maximum=1.0)
+        self.progress.pack(fill=tk.X, pady=5)
+
+        self.table = ttk.Treeview(main_frame, columns=[name for name, _, _ in COLUMNS],
+                                  show='headings', height=12)
+        for name, heading, width in COLUMNS:
+            self.table.heading(name, text=heading)
+            self.table.column(name, width=width, anchor=tk.W if name == 'protocol' else tk.E)
+        self.table.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=5)
+        self.save_btn = ttk.Button(btn_frame, text="Save Report", command=self.save_report,
+                                   state=tk.DISABLED)
+        self.save_btn.pack(side=tk.RIGHT, padx=2)
+        self.stop_btn = ttk.Button(btn_frame, text="Stop", command=self.stop)
+        self.stop_btn.pack(side=tk.RIGHT, padx=2)
+
+        threading.Thread(target=self.read_files, daemon=True).start()
+        self.window.after(POLL_INTERVAL, self.poll)
+
+    def read_files(self):
+        from progressive import format_ci, run_progressive
+
+        def publish(estimate):
+            # The table rows are built here, so the Tk thread never touches pandas
+            rows = [(
+                row['protocol'],
+                format_ci(row['avg_dlp'], row['dlp_ci']),
+                format_ci(row['avg_ctdi'], row['ctdi_ci']),
+                f"{row['drl_level']:.1f}",
+                format_ci(row['percentage'], row['percentage_ci'], '%'),
+                row['count']
+            ) for row in estimate.comparison()]
+            self.updates.put(('estimate', (estimate.describe(), estimate.fraction, rows)))
+
+        try:
+            estimate = run_progressive(self.path, self.drl_config, publish, self.recursive,
+                                       *self.date_range, results=self.results,
+                                       failures=self.failures,
+                                       cancelled=self.cancelled.is_set)
+            self.failures.save()
+            self.updates.put(('done', estimate.exact and not self.cancelled.is_set()))
+        except Exception as e:
+            self.updates.put(('error', str(e)))
+        finally:
+            if self.cancelled.is_set():
+                self.results.close()
+
+    def poll(self):
+        if self.closed:
+            return
+        try:
+            while True:
+                kind, data = self.updates.get_nowait()
+                if kind == 'estimate':
+                    self.show_estimate(*data)
+                elif kind == 'done':
+                    self.show_finished(data)
+                    return
+                else:
+                    self.finished = True
+                    self.stop_btn['state'] = tk.DISABLED
+                    messagebox.showerror("Error", f"Failed to read files: {data}", parent=self.window)
+                    return
+        except queue.Empty:
+            pass
+        self.window.after(POLL_INTERVAL, self.poll)
+
+    def show_estimate(self, progress, fraction, rows):
+        self.progress_var.set(progress)
+        self.progress['value'] = fraction
+
+        self.table.delete(*self.table.get_children())
+        for row in rows:
+            self.table.insert('', tk.END, values=row)
+
+    def show_finished(self, exact):
+        self.finished = True
+        self.stop_btn['state'] = tk.DISABLED
+        if exact:
+            self.on_finished(self.results, self.failures)
+            self.save_btn['state'] = tk.NORMAL
+
+    def stop(self):
+        self.cancelled.set()
+        self.stop_btn['state'] = tk.DISABLED
+        self.progress_var.set(f"{self.progress_var.get()} - stopped")
+
+    def save_report(self):
+        if not len(self.results):
+            messagebox.showerror("Error", "No valid DICOM SR files found", parent=self.window)
+            return
+        self.on_save(self.results)
+
+    def close(self):
+        self.closed = True
+        self.cancelled.set()
+        if self.finished:
+            self.results.close()
+        self.window.destroy()
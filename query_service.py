@@ -0,0 +1,277 @@
+# query_service.py
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import dose_summary
+import pdf_report
+from dose_cube import DoseCube, CUBE_FILE
+from drl_config import DRLConfiguration
+
+HOST = '127.0.0.1'
+PORT = 8765
+# Responses kept for repeated queries
+CACHE_SIZE = 256
+# PDF reports rendered at the same time
+PDF_WORKERS = 2
+# Dimensions that can be used for ?by= of /summary
+SUMMARY_DIMENSIONS = ['StudyDate', 'Month', 'Year'] + dose_summary.KEYS + ['DRLProtocol']
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               500: "Internal Server Error"}
+
+
+class QueryError(Exception):
+    """Invalid query parameter, answered with 400 Bad Request"""
+
+
+def parse_query_date(value):
+    for date_format in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise QueryError(f"invalid date '{value}', expected yyyy-mm-dd")
+
+
+def parse_filters(query):
+    """DoseCube.select() arguments from query parameters.
+
+    from/to are StudyDates (inclusive); device, protocol, drl_protocol and
+    weight can be repeated; age_min/age_max are whole years.
+    """
+    filters = {}
+    for name, key in (('from', 'date_from'), ('to', 'date_to')):
+        if name in query:
+            filters[key] = parse_query_date(query[name][-1])
+    for name, key in (('device', 'devices'), ('protocol', 'protocols'),
+                      ('drl_protocol', 'drl_protocols'), ('weight', 'weight_categories')):
+        if name in query:
+            filters[key] = query[name]
+    for name in ('age_min', 'age_max'):
+        if name in query:
+            try:
+                filters[name] = int(query[name][-1])
+            except ValueError:
+                raise QueryError(f"invalid {name} '{query[name][-1]}', expected whole years")
+    return filters
+
+
+def json_value(value):
+    """Plain Python value of a pandas/numpy scalar; NaN and missing values become None"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat()
+    return str(value)
+
+
+def json_rows(rows):
+    return [{key: json_value(value) for key, value in row.items()} for row in rows]
+
+
+def render_pdf(summary, protocols, date_range, device):
+    """PDF report as bytes (runs in a worker process, with the DRL protocols of the service)"""
+    drl_config = DRLConfiguration()
+    drl_config.protocols = protocols
+    with tempfile.TemporaryDirectory(prefix='dicom_sr_service_') as work_dir:
+        pdf_path = os.path.join(work_dir, "report.pdf")
+        pdf_report.generate_pdf_report(summary, pdf_path, drl_config, date_range, device)
+        with open(pdf_path, 'rb') as f:
+            return f.read()
+
+
+class QueryService:
+    """Local HTTP service answering JSON queries from the dose cube.
+
+    The dose cube is loaded once and shared by all clients, so nobody has to
+    rescan the archive to look at the data. Responses are cached; the cache is
+    cleared when the cube file is updated by an ingest (GUI or CLI run) or when
+    drl_config.json changes. PDF reports are rendered in a process pool, as in
+    batch_reports: rendering is CPU bound and would otherwise hold the GIL and
+    stop other queries from being answered meanwhile.
+
+    GET /status, /dimensions, /summary?by=..., /drl and /report.pdf; see
+    parse_filters() for the filter parameters.
+    """
+
+    def __init__(self, cube_file=CUBE_FILE, drl_config=None):
+        self.dose_cube = DoseCube(cube_file)
+        self.drl_config = drl_config or DRLConfiguration()
+        self.dose_cube.rematch(self.drl_config)
+        self.cache = OrderedDict()
+        self.pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        self.file_states = self.current_file_states()
+        self.routes = {
+            '/status': self.status,
+            '/dimensions': self.dimensions,
+            '/summary': self.summary,
+            '/drl': self.drl,
+            '/report.pdf': self.report
+        }
+
+    def current_file_states(self):
+        states = []
+        for file_path in (self.dose_cube.file_path, self.drl_config.config_file):
+            try:
+                states.append(os.stat(file_path).st_mtime_ns)
+            except OSError:
+                states.append(None)
+        return states
+
+    def refresh(self):
+        """Reload the cube and the DRL configuration if their files have changed"""
+        file_states = self.current_file_states()
+        if file_states == self.file_states:
+            return
+        cube_state, config_state = file_states
+        if cube_state != self.file_states[0]:
+            self.dose_cube.load()
+        if config_state != self.file_states[1]:
+            self.drl_config.load_config()
+        self.dose_cube.rematch(self.drl_config)
+        self.file_states = file_states
+        self.cache.clear()
+
+    async def serve(self, host=HOST, port=PORT):
+        if self.dose_cube.load_error:
+            print(self.dose_cube.load_error)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving {len(self.dose_cube)} records on http://{host}:{port}/")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pdf_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            # Headers are not used, but have to be read
+            while (await reader.readline()).strip():
+                pass
+            if len(request_line) != 3:
+                response = self.error(400, "malformed request")
+            elif request_line[0] != 'GET':
+                response = self.error(405, "only GET is supported")
+            else:
+                response = await self.respond(request_line[1])
+
+            status, content_type, body = response
+            writer.write((f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                          f"Content-Type: {content_type}\r\n"
+                          f"Content-Length: {len(body)}\r\n"
+                          f"Connection: close\r\n\r\n").encode('latin-1') + body)
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, target):
+        url = urlsplit(target)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            return self.error(404, f"unknown path '{url.path}'")
+        query = parse_qs(url.query)
+
+        self.refresh()
+        key = (url.path, tuple(sorted((name, tuple(values)) for name, values in query.items())))
+        task = self.cache.get(key)
+        if task is None:
+            # Identical queries arriving at the same time share one task
+            task = asyncio.ensure_future(handler(query))
+            self.cache[key] = task
+            while len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+
+        try:
+            response = await asyncio.shield(task)
+        except QueryError as e:
+            response = self.error(400, str(e))
+        except Exception as e:
+            response = self.error(500, f"{type(e).__name__}: {e}")
+        if response[0] != 200 and self.cache.get(key) is task:
+            del self.cache[key]
+        return response
+
+    @staticmethod
+    def error(status, message):
+        return status, 'application/json', json.dumps({'error': message}).encode('utf-8')
+
+    @staticmethod
+    def json_response(data):
+        return 200, 'application/json', json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    async def status(self, query):
+        return self.json_response({
+            'records': len(self.dose_cube),
+            'cells': len(self.dose_cube.cells),
+            'drl_protocols': len(self.drl_config.get_all_protocols())
+        })
+
+    async def dimensions(self, query):
+        """Values that can be used in the filters"""
+        cells = self.dose_cube.cells
+        dates = cells['StudyDate'].dropna()
+        return self.json_response({
+            'from': json_value(dates.min()) if len(dates) else None,
+            'to': json_value(dates.max()) if len(dates) else None,
+            'device': sorted(cells['DeviceObserverModelName'].dropna().unique().tolist()),
+            'protocol': sorted(cells['AcquisitionProtocol'].dropna().unique().tolist()),
+            'drl_protocol': sorted(p for p in cells['DRLProtocol'].unique() if p),
+            'weight': [label for _, _, label in dose_summary.WEIGHT_RANGES]
+        })
+
+    async def summary(self, query):
+        """Record count and mean TotalDLP/CTDIvol grouped by ?by= (default AcquisitionProtocol)"""
+        by = [dimension for values in query.get('by', ['AcquisitionProtocol'])
+              for dimension in values.split(',')]
+        unknown = [dimension for dimension in by if dimension not in SUMMARY_DIMENSIONS]
+        if unknown:
+            raise QueryError(f"unknown dimension {', '.join(unknown)}; "
+                             f"use {', '.join(SUMMARY_DIMENSIONS)}")
+        stats = self.dose_cube.rollup(by, **parse_filters(query)).reset_index()
+        return self.json_response(json_rows(stats.to_dict('records')))
+
+    async def drl(self, query):
+        """DRL comparison rows, as calculate_drl_comparison in the GUI"""
+        summary = self.dose_cube.query(**parse_filters(query))
+        return self.json_response(json_rows(dose_summary.drl_comparison(summary, self.drl_config)))
+
+    async def report(self, query):
+        filters = parse_filters(query)
+        summary = self.dose_cube.query(**filters)
+        if not len(summary):
+            raise QueryError("no data for the selected filters")
+        date_range = pdf_report.format_date_range(
+            *(filters[key].strftime('%d.%m.%Y') if key in filters else None
+              for key in ('date_from', 'date_to')))
+        devices = filters.get('devices', [])
+        device = devices[0] if len(devices) == 1 else ''
+
+        body = await asyncio.get_running_loop().run_in_executor(
+            self.pdf_pool, render_pdf, summary, self.drl_config.protocols, date_range, device)
+        return 200, 'application/pdf', body
+
+
+def run(host=HOST, port=PORT, cube_file=CUBE_FILE):
+    asyncio.run(QueryService(cube_file).serve(host, port))
@@ -0,0 +1,53 @@
+# record_keys.py
+import hashlib
+import os
+
+import numpy as np
+
+from dicom_sources import split_source, member_source
+from dose_records import SOURCE_COLUMN, UID_COLUMN
+
+# Bytes per key; collisions are negligible for any realistic number of SRs
+KEY_SIZE = 16
+
+
+def normalized_source(source):
+    """Source with the file system path resolved, e.g. for a mapped drive or a symlink"""
+    archive_path, member_name = split_source(source)
+    path = os.path.normcase(os.path.realpath(archive_path))
+    return member_source(path, member_name) if member_name is not None else path
+
+
+def record_keys(df):
+    """Key of every record: its SOPInstanceUID, or the resolved path if it has none.
+
+    The same SR read from another path (another drive letter, a copy of the
+    folder, the folder and its ZIP) gets the same key.
+    """
+    keys = [f"uid:{uid}" if uid else f"path:{normalized_source(source)}"
+            for uid, source in zip(df[UID_COLUMN], df[SOURCE_COLUMN])]
+    return np.array([hashlib.blake2b(key.encode('utf-8'), digest_size=KEY_SIZE).digest()
+                     for key in keys], dtype=f'S{KEY_SIZE}')
+
+
+class RecordKeySet:
+    """Keys of the records already added to an index, as a sorted array of digests.
+
+    Takes KEY_SIZE bytes per record instead of a set of path strings, so it
+    stays small when pickled with the index.
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=f'S{KEY_SIZE}')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def new_mask(self, keys):
+        """True for keys not added yet; of keys repeated in the batch only the first is new"""
+        first = np.zeros(len(keys), dtype=bool)
+        first[np.unique(keys, return_index=True)[1]] = True
+        return first & ~np.isin(keys, self.keys)
+
+    def add(self, keys):
+        self.keys = np.union1d(self.keys, keys)
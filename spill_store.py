@@ -0,0 +1,123 @@
+# spill_store.py
+import pickle
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import Workbook
+
+from dose_records import DoseRecordBuilder, COLUMNS
+
+CHUNK_SIZE = 10000
+EXCEL_MAX_ROWS = 1048576
+
+
+class SpillStore:
+    """Extracted records, flushed in chunks of chunk_size to a temporary file.
+
+    Only the chunk being filled is kept in memory. Every flushed chunk is a
+    pickled DataFrame (column arrays and categoricals), so reading it back with
+    iter_chunks() is cheap and memory use depends on chunk_size only.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, directory=None):
+        self.chunk_size = chunk_size
+        self.file = tempfile.TemporaryFile(prefix='dicom_sr_spill_', dir=directory)
+        self.builder = DoseRecordBuilder()
+        self.chunk_count = 0
+        self.record_count = 0
+
+    def __len__(self):
+        return self.record_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, record):
+        self.builder.append(record)
+        self.record_count += 1
+        if len(self.builder) >= self.chunk_size:
+            self.flush()
+
+    def append_chunk(self, df):
+        """Add records that are already a DataFrame (see DoseRecordBuilder.to_dataframe)"""
+        self.flush()
+        self.file.seek(0, 2)
+        pickle.dump(df, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.chunk_count += 1
+        self.record_count += len(df)
+
+    def flush(self):
+        if not len(self.builder):
+            return
+        self.file.seek(0, 2)
+        pickle.dump(self.builder.to_dataframe(), self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.chunk_count += 1
+        self.builder = DoseRecordBuilder()
+
+    def iter_chunks(self):
+        """Yield the stored DataFrame chunks in insertion order"""
+        self.flush()
+        position = 0
+        for _ in range(self.chunk_count):
+            self.file.seek(position)
+            chunk = pickle.load(self.file)
+            position = self.file.tell()
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+
+def append_chunk(file_path, df):
+    """Append a DataFrame chunk to a spill file on disk"""
+    with open(file_path, 'ab') as f:
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_chunks(file_path):
+    """Yield the DataFrame chunks of a spill file written with append_chunk()"""
+    with open(file_path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def write_excel(chunks, file_path):
+    """Stream DataFrame chunks into an .xlsx file without holding all rows in memory.
+
+    Sheets are continued in Sheet2, Sheet3... when Excel's row limit is reached.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = None
+    rows_in_sheet = EXCEL_MAX_ROWS
+
+    for chunk in chunks:
+        chunk = chunk[COLUMNS].copy()
+        chunk['Modality'] = chunk['Modality'].astype(object).replace('SR', 'CT')
+        for row in chunk.itertuples(index=False, name=None):
+            if rows_in_sheet >= EXCEL_MAX_ROWS:
+                sheet = workbook.create_sheet(f"Sheet{len(workbook.worksheets) + 1}")
+                sheet.append(COLUMNS)
+                rows_in_sheet = 1
+            sheet.append([_excel_value(value) for value in row])
+            rows_in_sheet += 1
+
+    if sheet is None:
+        workbook.create_sheet("Sheet1").append(COLUMNS)
+    workbook.save(file_path)
+
+
+def _excel_value(value):
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    return value
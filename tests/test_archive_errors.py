@@ -0,0 +1,100 @@
+# tests/test_archive_errors.py
+"""A bad archive in an export folder is recorded as failed and the rest is still read.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import dicom_sources
+import dose_records
+from drl_config import DRLConfiguration
+from failure_cache import FailureCache
+from progressive import run_progressive
+from spill_store import SpillStore
+from test_record_dedupe import write_sr
+
+
+class BadArchivesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.work_dir, 'data')
+        os.makedirs(self.data_dir)
+        write_sr(os.path.join(self.data_dir, 'IM1.dcm'), 'P1', '20240105', 100)
+
+        # ZIP with one member whose data does not match its CRC
+        members = []
+        for number in range(3):
+            member = os.path.join(self.work_dir, f'IM{number}.dcm')
+            write_sr(member, 'P2', '20240201', 200)
+            members.append(member)
+        self.bad_zip = os.path.join(self.data_dir, 'crc.zip')
+        with zipfile.ZipFile(self.bad_zip, 'w') as archive:
+            for member in members:
+                archive.write(member, os.path.basename(member))
+        with open(self.bad_zip, 'rb') as f:
+            data = bytearray(f.read())
+        with open(members[1], 'rb') as f:
+            content = f.read()
+        data[data.find(content) + len(content) - 1] ^= 0xFF
+        with open(self.bad_zip, 'wb') as f:
+            f.write(data)
+
+        # Compressed tar cut off in the middle
+        self.truncated_tar = os.path.join(self.data_dir, 'truncated.tar.gz')
+        with tarfile.open(self.truncated_tar, 'w:gz') as archive:
+            for number in range(20):
+                member = os.path.join(self.work_dir, f'T{number}.dcm')
+                write_sr(member, 'P3', '20240301', 300)
+                archive.add(member, os.path.basename(member))
+        with open(self.truncated_tar, 'r+b') as f:
+            f.truncate(os.path.getsize(self.truncated_tar) // 2)
+
+        # Not an archive at all
+        self.fake_zip = os.path.join(self.data_dir, 'notes.zip')
+        with open(self.fake_zip, 'w') as f:
+            f.write("not an archive")
+
+        self.failures = FailureCache(os.path.join(self.work_dir, 'failed_files.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def assert_failures_recorded(self):
+        self.assertIn(dicom_sources.member_source(self.bad_zip, 'IM1.dcm'), self.failures.failures)
+        self.assertIn(self.truncated_tar, self.failures.failures)
+        self.assertIn(self.fake_zip, self.failures.failures)
+
+    def test_report_run_goes_on(self):
+        dicom_files = dicom_sources.find_dicom_files(self.data_dir, failures=self.failures)
+        self.assertIn(os.path.join(self.data_dir, 'IM1.dcm'), dicom_files)
+        self.assertIn(dicom_sources.member_source(self.bad_zip, 'IM0.dcm'), dicom_files)
+        self.assertIn(dicom_sources.member_source(self.bad_zip, 'IM2.dcm'), dicom_files)
+        self.assert_failures_recorded()
+
+        with SpillStore() as results:
+            dose_records.extract_records(dicom_sources.iter_source_files(dicom_files), results,
+                                         self.failures)
+            self.assertEqual(len(results), len(dicom_files))
+
+    def test_progressive_run_goes_on(self):
+        estimate = run_progressive(self.data_dir, DRLConfiguration(), lambda estimate: None,
+                                   failures=self.failures)
+        self.assertTrue(estimate.exact)
+        self.assertGreaterEqual(estimate.summary['count'].sum(), 3)
+        self.assert_failures_recorded()
+
+
+if __name__ == '__main__':
+    unittest.main()
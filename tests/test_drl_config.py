@@ -0,0 +1,83 @@
+# tests/test_drl_config.py
+"""DRL configuration changes are batched: one copy and one write per batch.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drl_config import DRLConfiguration
+
+
+def protocol(dlp):
+    return {'protocol_match': ['chest'], 'adult': {'DLP': dlp, 'CTDIvol': 10.0}, 'child': {}}
+
+
+class DRLConfigurationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.work_dir, 'drl_config.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def configuration(self, autosave=True):
+        drl_config = DRLConfiguration(autosave)
+        drl_config.config_file = self.config_file
+        drl_config.protocols = {}
+        drl_config.writes = 0
+        save_config = drl_config.save_config
+
+        def counted_save_config():
+            drl_config.writes += 1
+            save_config()
+        drl_config.save_config = counted_save_config
+        return drl_config
+
+    def test_batch_writes_and_notifies_once(self):
+        drl_config = self.configuration()
+        notified = []
+        drl_config.subscribe(notified.append)
+        before = drl_config.protocols
+
+        started = time.monotonic()
+        with drl_config.batch():
+            for number in range(20000):
+                drl_config.add_protocol(f"Protocol {number}", protocol(number))
+            drl_config.delete_protocol("Protocol 0")
+        self.assertLess(time.monotonic() - started, 5)
+
+        self.assertEqual(drl_config.writes, 1)
+        self.assertEqual(len(notified), 1)
+        self.assertEqual(before, {})
+        self.assertEqual(len(drl_config.protocols), 19999)
+        with open(self.config_file, encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)), 19999)
+
+    def test_without_autosave_changes_are_written_by_flush(self):
+        drl_config = self.configuration(autosave=False)
+        drl_config.add_protocol("Chest", protocol(400))
+        drl_config.add_protocol("Head", protocol(900))
+        drl_config.delete_protocol("Chest")
+        self.assertEqual(list(drl_config.protocols), ["Head"])
+        self.assertFalse(os.path.exists(self.config_file))
+
+        drl_config.flush()
+        drl_config.flush()
+        self.assertEqual(drl_config.writes, 1)
+        with open(self.config_file, encoding='utf-8') as f:
+            self.assertEqual(list(json.load(f)), ["Head"])
+
+
+if __name__ == '__main__':
+    unittest.main()
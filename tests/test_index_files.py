@@ -0,0 +1,68 @@
+# tests/test_index_files.py
+"""Unreadable or outdated dose cube and patient index files are replaced, not fatal.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dose_cube import DoseCube
+from drl_config import DRLConfiguration
+from patient_index import PatientIndex
+from test_record_dedupe import read_records, write_sr
+
+
+class IndexFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.work_dir, 'data')
+        os.makedirs(self.data_dir)
+        write_sr(os.path.join(self.data_dir, 'IM1.dcm'), 'P1', '20240105', 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def check_replaced(self, index_class, file_path):
+        index = index_class(file_path)
+        self.assertIsNotNone(index.load_error)
+        self.assertEqual(len(index), 0)
+        self.assertTrue(os.path.exists(file_path + '.bad'))
+        self.assertFalse(os.path.exists(file_path))
+
+        if index_class is DoseCube:
+            index.add(read_records(self.data_dir), DRLConfiguration())
+        else:
+            index.add(read_records(self.data_dir))
+        index.save()
+        index = index_class(file_path)
+        self.assertIsNone(index.load_error)
+        self.assertEqual(len(index), 1)
+
+    def test_truncated_files(self):
+        for index_class, name in ((DoseCube, 'dose_cube.pkl'), (PatientIndex, 'patient_index.pkl')):
+            file_path = os.path.join(self.work_dir, name)
+            with open(file_path, 'wb') as f:
+                f.write(pickle.dumps({'cells': list(range(1000))})[:50])
+            self.check_replaced(index_class, file_path)
+
+    def test_outdated_files(self):
+        # Layout before the record keys were introduced
+        for index_class, name in ((DoseCube, 'dose_cube.pkl'), (PatientIndex, 'patient_index.pkl')):
+            file_path = os.path.join(self.work_dir, name)
+            with open(file_path, 'wb') as f:
+                pickle.dump({'cells': None, 'studies': {}, 'cumulative': {}, 'sources': set()}, f)
+            self.check_replaced(index_class, file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
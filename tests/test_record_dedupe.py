@@ -0,0 +1,132 @@
+# tests/test_record_dedupe.py
+"""The same SR ingested under two paths must be counted once.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.sequence import Sequence
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dicom_sources
+from dose_cube import DoseCube
+from dose_records import DoseRecordBuilder, extract_patient_dose_data
+from drl_config import DRLConfiguration
+from patient_index import PatientIndex
+
+
+def content_item(meaning, text=None, number=None):
+    item = Dataset()
+    concept = Dataset()
+    concept.CodeMeaning = meaning
+    item.ConceptNameCodeSequence = Sequence([concept])
+    if text is not None:
+        item.TextValue = text
+    if number is not None:
+        value = Dataset()
+        value.NumericValue = str(number)
+        item.MeasuredValueSequence = Sequence([value])
+    return item
+
+
+def write_sr(file_path, patient_id, study_date, dlp, with_uid=True):
+    file_meta = FileMetaDataset()
+    file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    file_meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.88.67'
+    file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    dcm = Dataset()
+    dcm.file_meta = file_meta
+    dcm.Modality = 'SR'
+    if with_uid:
+        dcm.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+    dcm.PatientID = patient_id
+    dcm.PatientBirthDate = '19700101'
+    dcm.StudyDate = study_date
+    acquisition = content_item('CT Acquisition')
+    acquisition.ContentSequence = Sequence([content_item('Acquisition Protocol', text='Chest')])
+    dcm.ContentSequence = Sequence([acquisition, content_item('DLP Total', number=dlp),
+                                    content_item('Mean CTDIvol', number=10)])
+    dcm.save_as(file_path, enforce_file_format=True)
+
+
+def read_records(path):
+    builder = DoseRecordBuilder()
+    for source, file in dicom_sources.iter_sources(path):
+        # ZIP members are opened by the worker in a real run
+        if isinstance(file, dicom_sources.ZipMember):
+            file = file.open()
+        builder.append(extract_patient_dose_data(source, file))
+    return builder.to_dataframe()
+
+
+class SamePathsTwiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.work_dir, 'data')
+        os.makedirs(self.data_dir)
+        write_sr(os.path.join(self.data_dir, 'IM1.dcm'), 'P1', '20240105', 100)
+        write_sr(os.path.join(self.data_dir, 'IM2.dcm'), 'P1', '20240610', 200)
+        write_sr(os.path.join(self.data_dir, 'IM3.dcm'), 'P2', '20240301', 300, with_uid=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_copy_and_zip_of_the_same_files(self):
+        copy_dir = os.path.join(self.work_dir, 'copy')
+        shutil.copytree(self.data_dir, copy_dir)
+        # Files without a SOPInstanceUID can only be recognized by their path
+        os.remove(os.path.join(copy_dir, 'IM3.dcm'))
+        archive = os.path.join(self.work_dir, 'data.zip')
+        with zipfile.ZipFile(archive, 'w') as f:
+            for name in ('IM1.dcm', 'IM2.dcm'):
+                f.write(os.path.join(self.data_dir, name), name)
+
+        patient_index = PatientIndex(os.path.join(self.work_dir, 'patient_index.pkl'))
+        self.assertEqual(patient_index.add(read_records(self.data_dir)), 3)
+        self.assertEqual(patient_index.add(read_records(copy_dir)), 0)
+        self.assertEqual(patient_index.add(read_records(archive)), 0)
+
+        patient_index.save()
+        patient_index = PatientIndex(patient_index.file_path)
+        self.assertEqual(patient_index.add(read_records(self.data_dir)), 0)
+        self.assertEqual(patient_index.cumulative_dlp('P1', months=0), (300.0, 2))
+        self.assertEqual(patient_index.cumulative_dlp('P2', months=0), (300.0, 1))
+
+    def test_dose_cube_counts_copies_once(self):
+        copy_dir = os.path.join(self.work_dir, 'copy')
+        shutil.copytree(self.data_dir, copy_dir)
+        os.remove(os.path.join(copy_dir, 'IM3.dcm'))
+
+        drl_config = DRLConfiguration()
+        dose_cube = DoseCube(os.path.join(self.work_dir, 'dose_cube.pkl'))
+        self.assertEqual(dose_cube.add(read_records(self.data_dir), drl_config), 3)
+        dose_cube.save()
+        dose_cube = DoseCube(dose_cube.file_path)
+        self.assertEqual(dose_cube.add(read_records(copy_dir), drl_config), 0)
+        self.assertEqual(len(dose_cube), 3)
+        self.assertEqual(dose_cube.query()['count'].sum(), 3)
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), "symlinks not supported")
+    def test_link_to_the_same_folder(self):
+        link_dir = os.path.join(self.work_dir, 'link')
+        os.symlink(self.data_dir, link_dir)
+
+        patient_index = PatientIndex(os.path.join(self.work_dir, 'patient_index.pkl'))
+        self.assertEqual(patient_index.add(read_records(self.data_dir)), 3)
+        self.assertEqual(patient_index.add(read_records(link_dir)), 0)
+        self.assertEqual(patient_index.cumulative_dlp('P2', months=0), (300.0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()